@@ -0,0 +1,43 @@
+# Микробенчмарк разбора команд: линейный поиск против индекса синонимов
+# Запуск: python -m benchmarks.bench_commands
+import timeit
+
+from labyrinth_game.commands import resolve_command
+from labyrinth_game.constants import COMMANDS
+from labyrinth_game.utils import parse_command
+
+INPUTS = ['go north', 'идти east', 'look', 'осмотреть', 'take torch',
+          'взять rusty_key', 'inventory', 'inv', 'solve', 'help',
+          'north', 'n', 'quit', 'абракадабра']
+
+
+def linear_command_type(command):
+    """Прежний способ: перебор всех списков синонимов"""
+    for cmd_type, cmd_list in COMMANDS.items():
+        if command in cmd_list:
+            return cmd_type
+    return None
+
+
+def run_linear():
+    for user_input in INPUTS:
+        command, _ = parse_command(user_input)
+        linear_command_type(command)
+
+
+def run_indexed():
+    for user_input in INPUTS:
+        command, _ = parse_command(user_input)
+        resolve_command(command)
+
+
+def main(number=20_000):
+    for name, func in (('линейный поиск', run_linear),
+                       ('индекс', run_indexed)):
+        best = min(timeit.repeat(func, number=number, repeat=5))
+        per_token = best / (number * len(INPUTS)) * 1e9
+        print(f"{name:<16} {per_token:8.1f} нс на команду")
+
+
+if __name__ == "__main__":
+    main()
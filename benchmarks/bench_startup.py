@@ -0,0 +1,67 @@
+# Время холодного запуска игры: от запуска процесса до первого приглашения
+# Запуск: python -m benchmarks.bench_startup
+import argparse
+import compileall
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import labyrinth_game
+from labyrinth_game.constants import PROMPTS
+
+# Цель: первое приглашение быстрее, чем за 30 мс
+TARGET_MS = 30
+
+# Так запускает игру скрипт project из pyproject.toml
+ENTRY_POINT = "from labyrinth_game.main import main; main()"
+
+
+def time_to_prompt(command):
+    """Секунды от запуска процесса до появления приглашения в stdout"""
+    prompt = PROMPTS['command'].encode()
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    output = b''
+    while prompt not in output:
+        chunk = os.read(process.stdout.fileno(), 65536)
+        if not chunk:
+            raise RuntimeError("Игра завершилась, не выдав приглашение")
+        output += chunk
+    elapsed = time.perf_counter() - started
+    process.communicate(b'quit\n')
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Время запуска игры до первого приглашения")
+    parser.add_argument('-n', '--runs', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    # Установленный пакет уже скомпилирован в .pyc (pip делает это при
+    # установке), а при PYTHONDONTWRITEBYTECODE их не создаст и сама игра
+    compileall.compile_dir(os.path.dirname(labyrinth_game.__file__), quiet=1)
+
+    baseline = [sys.executable, '-c', 'pass']
+    game = [sys.executable, '-c', ENTRY_POINT]
+    time_to_prompt(game)  # прогрев файлового кэша
+
+    interpreter = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        subprocess.run(baseline, check=True)
+        interpreter.append(time.perf_counter() - started)
+    timings = [time_to_prompt(game) for _ in range(args.runs)]
+
+    best, median = min(timings) * 1000, statistics.median(timings) * 1000
+    print(f"Пустой интерпретатор: {min(interpreter) * 1000:6.1f} мс")
+    print(f"До приглашения:       {best:6.1f} мс (медиана {median:.1f} мс)")
+    verdict = "в пределах" if median <= TARGET_MS else "больше"
+    print(f"Цель {TARGET_MS} мс: медиана {verdict} цели")
+
+
+if __name__ == "__main__":
+    main()
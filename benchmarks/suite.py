@@ -0,0 +1,252 @@
+# Набор бенчмарков горячего пути команд с сохранением результатов в JSON
+# Запуск: python -m benchmarks.suite -o results.json
+#         python -m benchmarks.suite --compare results.json
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import timeit
+
+from labyrinth_game.generator import WorldPlan, generate_world
+from labyrinth_game.main import process_command
+from labyrinth_game.output import NullSink
+from labyrinth_game.player_actions import move_player
+from labyrinth_game.session import new_game_state
+from labyrinth_game.utils import (
+    describe_current_room,
+    parse_command,
+    show_help,
+    solve_puzzle,
+)
+from labyrinth_game.world import add_room_item, get_room, get_world
+from labyrinth_game.worldfile import write_world
+
+# Допустимое замедление относительно базовых результатов
+THRESHOLD = 0.10
+
+PARSE_INPUTS = ['go north', 'идти east', 'look', 'take torch', 'inventory',
+                'n', 'solve', 'абракадабра']
+
+OPPOSITE = {'north': 'south', 'south': 'north', 'east': 'west', 'west': 'east'}
+
+
+def make_state(world_path=None):
+    game_state = new_game_state(seed=1, world_path=world_path)
+    game_state.output = NullSink()
+    return game_state
+
+
+def find_corridor(game_state):
+    """
+    Пара соседних комнат без ловушек и запертых дверей, между которыми
+    можно ходить туда и обратно: (комната, направление туда)
+    """
+    world = get_world(game_state)
+    for room_name in world:
+        if room_name in ('trap_room', 'treasure_room'):
+            continue
+        for direction, next_room in world[room_name]['exits'].items():
+            if next_room in ('trap_room', 'treasure_room'):
+                continue
+            back = world[next_room]['exits'].get(OPPOSITE.get(direction))
+            if back == room_name:
+                return room_name, direction
+    raise ValueError("В мире нет подходящего прохода")
+
+
+def find_puzzle_room(game_state):
+    """Комната с загадкой, где неверный ответ безопасен"""
+    for room_name, room_data in get_world(game_state).items():
+        if room_data.get('puzzle') and room_name not in ('trap_room',
+                                                         'treasure_room'):
+            return room_name
+    raise ValueError("В мире нет комнаты с загадкой")
+
+
+def bench_cases(world_path=None):
+    """
+    Случаи для замера: {имя: функция без аргументов}
+
+    Каждая функция оставляет состояние таким, каким его получила, чтобы
+    повторные запуски мерили одно и то же.
+    """
+    cases = {}
+    game_state = make_state(world_path)
+    room, direction = find_corridor(game_state)
+    back = OPPOSITE[direction]
+    game_state.current_room = room
+    neighbour = get_room(game_state, room)['exits'][direction]
+    game_state.player_inventory = ['torch']
+
+    def command(text):
+        return lambda: process_command(game_state, text)
+
+    def parse():
+        for user_input in PARSE_INPUTS:
+            parse_command(user_input)
+
+    def go():
+        process_command(game_state, f'go {direction}')
+        process_command(game_state, f'go {back}')
+
+    def bare_direction():
+        process_command(game_state, direction)
+        process_command(game_state, back)
+
+    def goto():
+        process_command(game_state, f'goto {neighbour}')
+        process_command(game_state, f'goto {room}')
+
+    def move():
+        move_player(game_state, direction)
+        move_player(game_state, back)
+
+    def take():
+        add_room_item(game_state, room, 'coin')
+        process_command(game_state, 'take coin')
+        game_state.player_inventory.pop()
+
+    def quit_game():
+        process_command(game_state, 'quit')
+        game_state.game_over = False
+
+    puzzle_state = make_state(world_path)
+    puzzle_state.current_room = find_puzzle_room(puzzle_state)
+
+    def solve():
+        process_command(puzzle_state, 'solve')
+        process_command(puzzle_state, 'не знаю')
+
+    def solve_direct():
+        solve_puzzle(puzzle_state)
+        process_command(puzzle_state, 'не знаю')
+
+    cases['parse_command'] = parse
+    cases['process:look'] = command('look')
+    cases['process:move'] = go
+    cases['process:directions'] = bare_direction
+    cases['process:goto'] = goto
+    cases['process:map'] = command('map')
+    cases['process:take'] = take
+    cases['process:use'] = command('use torch')
+    cases['process:solve'] = solve
+    cases['process:inventory'] = command('inventory')
+    cases['process:quit'] = quit_game
+    cases['process:help'] = command('help')
+    cases['process:unknown'] = command('абракадабра')
+    cases['describe_current_room'] = lambda: describe_current_room(game_state)
+    cases['move_player'] = move
+    cases['solve_puzzle'] = solve_direct
+    cases['show_help'] = lambda: show_help(game_state)
+    return cases
+
+
+def measure(func, min_time=0.2, repeat=5):
+    """Лучшее время одного вызова в наносекундах"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def prepare_world(spec, directory):
+    """
+    Путь к файлу мира по описанию: 'builtin' (встроенный) или число комнат
+    сгенерированного мира
+    """
+    if spec == 'builtin':
+        return None
+    rooms = int(spec)
+    path = os.path.join(directory, f'grid-{rooms}.labw')
+    write_world(path, generate_world(rooms), WorldPlan(rooms).meta())
+    return path
+
+
+def run_suite(worlds, min_time=0.2, repeat=5, only=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for spec in worlds:
+            world_path = prepare_world(spec, directory)
+            world_results = results[spec] = {}
+            for name, func in bench_cases(world_path).items():
+                if only and only not in name:
+                    continue
+                func()  # прогрев кэшей (маршруты, комнаты из файла)
+                world_results[name] = measure(func, min_time, repeat)
+                print(f"{spec:>10} {name:<24} {world_results[name]:10.0f} нс",
+                      file=sys.stderr)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+    """
+    Сравнивает результаты с базовыми
+
+    Returns:
+        list: (мир, бенчмарк, было, стало, отношение, регрессия ли)
+    """
+    rows = []
+    for spec, world_results in current['results'].items():
+        base_results = baseline['results'].get(spec, {})
+        for name, value in world_results.items():
+            base = base_results.get(name)
+            if base is None:
+                continue
+            ratio = value / base
+            rows.append((spec, name, base, value, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def print_comparison(rows, threshold):
+    for spec, name, base, value, ratio, regressed in rows:
+        mark = "  РЕГРЕССИЯ" if regressed else ""
+        print(f"{spec:>10} {name:<24} {base:10.0f} -> {value:10.0f} нс "
+              f"({ratio - 1:+7.1%}){mark}")
+    regressions = sum(row[-1] for row in rows)
+    print(f"Регрессий больше {threshold:.0%}: {regressions} из {len(rows)}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Бенчмарки горячего пути команд Лабиринта")
+    parser.add_argument('--worlds', default='builtin,10000',
+                        help="миры через запятую: builtin или число комнат")
+    parser.add_argument('-o', '--output', help="сохранить результаты в JSON")
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help="сравнить с сохраненными результатами")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="допустимое замедление (0.1 = 10%%)")
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help="секунд на один замер")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('-k', dest='only', help="только бенчмарки с этой подстрокой")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.worlds.split(','), args.min_time, args.repeat,
+                       args.only)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if print_comparison(compare(baseline, report, args.threshold),
+                            args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
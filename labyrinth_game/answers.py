@@ -0,0 +1,187 @@
+# Проверка ответов на загадки: нормализация и нечеткое сравнение
+#
+# Ответ и все варианты правильных ответов приводятся к ключу: NFKC,
+# casefold, ё -> е, без знаков препинания, числительные - цифрами
+# ("Двадцать один" -> "21"). Совпадение ключей засчитывается сразу,
+# иначе допускается небольшое число опечаток (расстояние Левенштейна).
+# Набор ключей строится один раз на каждый набор вариантов ответа; в
+# больших наборах кандидаты с опечаткой ищутся по индексу удалений.
+import unicodedata
+from collections import OrderedDict
+
+UNITS = {
+    'ноль': 0, 'один': 1, 'одна': 1, 'одно': 1, 'два': 2, 'две': 2,
+    'три': 3, 'четыре': 4, 'пять': 5, 'шесть': 6, 'семь': 7, 'восемь': 8,
+    'девять': 9, 'десять': 10, 'одиннадцать': 11, 'двенадцать': 12,
+    'тринадцать': 13, 'четырнадцать': 14, 'пятнадцать': 15,
+    'шестнадцать': 16, 'семнадцать': 17, 'восемнадцать': 18,
+    'девятнадцать': 19,
+}
+TENS = {
+    'двадцать': 20, 'тридцать': 30, 'сорок': 40, 'пятьдесят': 50,
+    'шестьдесят': 60, 'семьдесят': 70, 'восемьдесят': 80, 'девяносто': 90,
+}
+HUNDREDS = {
+    'сто': 100, 'двести': 200, 'триста': 300, 'четыреста': 400,
+    'пятьсот': 500, 'шестьсот': 600, 'семьсот': 700, 'восемьсот': 800,
+    'девятьсот': 900,
+}
+NUMBER_WORDS = {**UNITS, **TENS, **HUNDREDS}
+
+# Наборы больше этого размера ищут опечатки по индексу, меньшие - перебором
+INDEX_MIN = 32
+
+# Сколько наборов ответов держать в кэше (в больших мирах их тысячи)
+MAX_CACHED = 4096
+
+
+def _merge_numbers(words):
+    """Заменяет подряд идущие числительные одним числом"""
+    result = []
+    total = None
+    # Разряд последнего слова: следующее слово должно быть младше
+    # ("сто двадцать три"), иначе начинается новое число
+    last = None
+    for word in words:
+        value = NUMBER_WORDS.get(word)
+        if value is None:
+            if total is not None:
+                result.append(str(total))
+                total = None
+            result.append(str(int(word)) if word.isdigit() else word)
+            continue
+        rank = 100 if value >= 100 else 10 if value >= 20 else 1
+        if total is not None and rank < last:
+            total += value
+        else:
+            if total is not None:
+                result.append(str(total))
+            total = value
+        last = rank
+    if total is not None:
+        result.append(str(total))
+    return result
+
+
+def normalize_answer(text):
+    """Ключ ответа для сравнения"""
+    text = unicodedata.normalize('NFKC', text).casefold().replace('ё', 'е')
+    text = ''.join(char if char.isalnum() else ' ' for char in text)
+    return ' '.join(_merge_numbers(text.split()))
+
+
+def tolerance(key):
+    """
+    Сколько опечаток допустимо в ответе
+
+    Числа и короткие слова должны совпадать точно, иначе "11" сошло бы
+    за "10".
+    """
+    if len(key) < 4 or key.isdigit():
+        return 0
+    return 1 if len(key) < 8 else 2
+
+
+def edit_distance(a, b, limit):
+    """
+    Расстояние Левенштейна, если оно не больше limit, иначе limit + 1
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        best = i
+        for j, char_b in enumerate(b, 1):
+            value = min(previous[j] + 1, current[j - 1] + 1,
+                        previous[j - 1] + (char_a != char_b))
+            current.append(value)
+            best = min(best, value)
+        # Вся строка таблицы уже дальше limit - дальше будет только больше
+        if best > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+def deletions(key, k):
+    """Ключ и все строки, получаемые из него удалением до k символов"""
+    variants = {key}
+    layer = {key}
+    for _ in range(k):
+        layer = {word[:i] + word[i + 1:] for word in layer for i in range(len(word))}
+        variants |= layer
+    return variants
+
+
+class DeletionIndex:
+    """
+    Индекс удалений (как в SymSpell): {строка после удалений: ключи}
+
+    Если ключи отличаются не больше чем на k правок, то удалением до k
+    символов из каждого их можно привести к общей строке. Поиск поэтому
+    перебирает только удаления из ответа игрока, а не весь набор ключей;
+    найденные кандидаты проверяются честным расстоянием.
+    """
+
+    def __init__(self, keys):
+        self.variants = {}
+        for key in keys:
+            for variant in deletions(key, tolerance(key)):
+                self.variants.setdefault(variant, []).append(key)
+
+    def candidates(self, key, k):
+        found = set()
+        for variant in deletions(key, k):
+            found.update(self.variants.get(variant, ()))
+        return found
+
+
+class AnswerSet:
+    """Нормализованные варианты правильного ответа одной загадки"""
+
+    def __init__(self, answers):
+        self.keys = frozenset(normalize_answer(answer) for answer in answers)
+        # Индекс удалений строится при первой опечатке: точные ответы
+        # его не требуют
+        self.index = None
+
+    def matches(self, answer, fuzzy=True):
+        key = normalize_answer(answer)
+        if key in self.keys:
+            return True
+        k = tolerance(key)
+        if not fuzzy or not k:
+            return False
+        if len(self.keys) < INDEX_MIN:
+            candidates = self.keys
+        else:
+            if self.index is None:
+                self.index = DeletionIndex(self.keys)
+            candidates = self.index.candidates(key, k)
+        # Опечатка допустима, только если и сам правильный ответ не короткий
+        return any(edit_distance(key, candidate, k) <= min(k, tolerance(candidate))
+                   for candidate in candidates)
+
+
+# Кэш наборов: {кортеж вариантов: AnswerSet}. Одинаковые варианты в разных
+# комнатах (и мирах) делят один набор.
+_ANSWER_SETS = OrderedDict()
+
+
+def get_answer_set(answers):
+    """Набор ключей для вариантов ответа (строится один раз)"""
+    answers = tuple(answers)
+    answer_set = _ANSWER_SETS.get(answers)
+    if answer_set is None:
+        answer_set = _ANSWER_SETS[answers] = AnswerSet(answers)
+        if len(_ANSWER_SETS) > MAX_CACHED:
+            _ANSWER_SETS.popitem(last=False)
+    else:
+        _ANSWER_SETS.move_to_end(answers)
+    return answer_set
+
+
+def check_answer(answer, answers, fuzzy=True):
+    """Подходит ли ответ игрока под один из вариантов"""
+    return get_answer_set(answers).matches(answer, fuzzy)
@@ -0,0 +1,126 @@
+# Пакетный запуск: прогон сценариев команд без интерактивного терминала
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from .main import run_commands, show_intro, split_commands
+from .output import MemorySink, flush_output, say
+from .session import dump_state, new_game_state
+from .utils import get_prompt
+
+
+def run_script(text, seed=None, world_path=None):
+    """
+    Прогоняет сценарий построчно через run_commands: строка с командами
+    через ';' выполняется так же, как при вводе в терминале
+
+    Returns:
+        tuple: (стенограмма игры, итоговый game_state, число команд)
+    """
+    game_state = new_game_state(seed, world_path)
+    sink = game_state.output = MemorySink()
+    commands = 0
+
+    # Ответы на загадки берутся из следующих строк сценария,
+    # как при вводе с клавиатуры
+    show_intro(game_state)
+    for line in text.splitlines():
+        if game_state.game_over:
+            break
+        user_input = line.strip()
+        say(game_state, get_prompt(game_state) + user_input)
+        commands += run_commands(game_state, split_commands(user_input),
+                                 echo=True)
+    flush_output(game_state)
+
+    return sink.getvalue(), dump_state(game_state), commands
+
+
+def output_names(paths):
+    """
+    Имена файлов результатов для сценариев: имя сценария без расширения
+    ('stdin' для '-'). Совпадающие имена (a/moves.txt и b/moves.txt)
+    получают номер: moves, moves-2, ...
+    """
+    names = []
+    used = set()
+    for path in paths:
+        base = 'stdin' if path == '-' else Path(path).stem
+        name, number = base, 1
+        while name in used:
+            number += 1
+            name = f"{base}-{number}"
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def run_file(path, name, out_dir, seed=None, world_path=None):
+    """
+    Выполняет один сценарий и сохраняет стенограмму и итоговое состояние
+    в out_dir под именем name (см. output_names)
+    """
+    if path == '-':
+        text = sys.stdin.read()
+    else:
+        text = Path(path).read_text(encoding='utf-8')
+
+    transcript, game_state, commands = run_script(text, seed, world_path)
+
+    out_dir = Path(out_dir)
+    (out_dir / f"{name}.log").write_text(transcript, encoding='utf-8')
+    with open(out_dir / f"{name}.state.json", 'w', encoding='utf-8') as f:
+        json.dump(game_state, f, ensure_ascii=False, indent=2)
+    return name, commands
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Пакетный прогон сценариев Лабиринта сокровищ")
+    parser.add_argument('scripts', nargs='*', default=['-'],
+                        help="файлы со сценариями ('-' - stdin)")
+    parser.add_argument('-o', '--out', default='batch_output',
+                        help="каталог для стенограмм и состояний")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help="число параллельных процессов")
+    parser.add_argument('--seed', type=int,
+                        help="зерно случайных событий (по умолчанию без зерна)")
+    parser.add_argument('--world', help="файл мира (по умолчанию встроенный)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    started = time.perf_counter()
+
+    # stdin читается в основном процессе, файлы - параллельно в пуле
+    results = []
+    run = partial(run_file, out_dir=args.out, seed=args.seed,
+                  world_path=args.world)
+    # Имена результатов назначаются заранее, чтобы одноименные сценарии
+    # из разных каталогов не перезаписали результаты друг друга
+    scripts = list(dict.fromkeys(args.scripts))
+    names = dict(zip(scripts, output_names(scripts)))
+    files = [path for path in names if path != '-']
+    if '-' in names:
+        results.append(run('-', names['-']))
+    file_names = [names[path] for path in files]
+    if len(files) > 1 and args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            chunksize = max(1, len(files) // (args.jobs * 4))
+            results.extend(pool.map(run, files, file_names, chunksize=chunksize))
+    else:
+        results.extend(map(run, files, file_names))
+
+    elapsed = time.perf_counter() - started
+    total = sum(commands for _, commands in results)
+    print(f"Сценариев: {len(results)}, команд: {total}, "
+          f"время: {elapsed:.2f} с ({total / elapsed:.0f} команд/с)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
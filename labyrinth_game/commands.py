@@ -0,0 +1,118 @@
+# Таблица команд: обратный индекс синонимов и префиксное дерево сокращений
+from .constants import COMMANDS, DIRECTIONS
+
+# Ключ узла префиксного дерева, под которым хранится тип полной команды
+_END = ''
+
+# Команды, которые нельзя сокращать: опечатка вроде 'q' не должна
+# завершать игру
+EXACT_ONLY = frozenset({'quit'})
+
+
+def build_alias_index(commands):
+    """
+    Строит словарь {синоним: тип команды}
+
+    Направления (north, south, ...) считаются отдельными командами.
+    """
+    index = {direction: direction for direction in DIRECTIONS}
+    for command_type, aliases in commands.items():
+        for alias in aliases:
+            index[alias] = command_type
+    return index
+
+
+def build_trie(alias_index):
+    """Префиксное дерево синонимов: вложенные словари по символам"""
+    root = {}
+    for alias, command_type in alias_index.items():
+        node = root
+        for char in alias:
+            node = node.setdefault(char, {})
+        node[_END] = command_type
+    return root
+
+
+def _collect(node, prefix, found):
+    """Обходит поддерево и собирает пары (синоним, тип)"""
+    for char, child in node.items():
+        if char == _END:
+            found.append((prefix, child))
+        else:
+            _collect(child, prefix + char, found)
+    return found
+
+
+def build_prefix_index(trie, exact_only=EXACT_ONLY):
+    """
+    Словарь однозначных сокращений {префикс: тип команды}
+
+    Префикс попадает в индекс, если все синонимы под ним относятся
+    к одному типу команды (например, 'inv' -> 'inventory') и этот тип
+    не из exact_only.
+    """
+    index = {}
+
+    def visit(node, prefix):
+        # Возвращает множество типов команд во всем поддереве
+        types = set()
+        for char, child in node.items():
+            if char == _END:
+                types.add(child)
+            else:
+                types |= visit(child, prefix + char)
+        if prefix and len(types) == 1:
+            command_type = next(iter(types))
+            if command_type not in exact_only:
+                index[prefix] = command_type
+        return types
+
+    visit(trie, '')
+    return index
+
+
+# Таблицы строятся один раз при импорте
+ALIAS_INDEX = build_alias_index(COMMANDS)
+COMMAND_TRIE = build_trie(ALIAS_INDEX)
+PREFIX_INDEX = build_prefix_index(COMMAND_TRIE)
+
+
+def resolve_command(command):
+    """
+    Определяет тип команды по синониму или однозначному сокращению
+
+    Returns:
+        str | None: Тип команды или None, если команда неизвестна
+    """
+    command_type = ALIAS_INDEX.get(command)
+    if command_type is None:
+        command_type = PREFIX_INDEX.get(command)
+    return command_type
+
+
+def complete_command(prefix):
+    """Все синонимы команд, начинающиеся с prefix (для автодополнения)"""
+    node = COMMAND_TRIE
+    for char in prefix:
+        node = node.get(char)
+        if node is None:
+            return []
+    return sorted(alias for alias, _ in _collect(node, prefix, []))
+
+
+def enable_tab_completion():
+    """
+    Включает автодополнение команд по Tab, если доступен модуль readline
+    """
+    try:
+        import readline
+    except ImportError:
+        return False
+
+    def completer(text, state):
+        matches = complete_command(text.lower())
+        return matches[state] if state < len(matches) else None
+
+    readline.set_completer(completer)
+    readline.parse_and_bind('tab: complete')
+    return True
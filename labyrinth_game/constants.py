@@ -1,12 +1,12 @@
 # Константы игры Лабиринт
 
-# Карта комнат
+# Карта комнат (базовый мир, не изменяется во время игры)
 ROOMS = {
     'entrance': {
         'description': 'Вы в темном входе лабиринта. '
                        'Стены покрыты мхом. На полу лежит старый факел.',
         'exits': {'north': 'hall', 'east': 'trap_room'},
-        'items': ['torch'],
+        'items': ('torch',),
         'puzzle': None,
         'reward': None
     },
@@ -14,7 +14,7 @@ ROOMS = {
         'description': 'Большой зал с эхом. '
                        'По центру стоит пьедестал с запечатанным сундуком.',
         'exits': {'south': 'entrance', 'west': 'library', 'north': 'treasure_room'},
-        'items': [],
+        'items': (),
         'puzzle': ('На пьедестале надпись: "Назовите число, '
                    'которое идет после девяти". Введите ответ цифрой или словом.', 
                    '10'),
@@ -24,7 +24,7 @@ ROOMS = {
         'description': 'Комната с хитрой плиточной поломкой. '
                        'На стене видна надпись: "Осторожно — ловушка".',
         'exits': {'west': 'entrance', 'north': 'crystal_cave'},
-        'items': ['rusty_key'],
+        'items': ('rusty_key',),
         'puzzle': ('Система плит активна. Чтобы пройти, назовите слово "шаг" '
                    'три раза подряд (введите "шаг шаг шаг")', 'шаг шаг шаг'),
         'reward': 'gold_ring'
@@ -33,7 +33,7 @@ ROOMS = {
         'description': 'Пыльная библиотека. На полках старые свитки. '
                        'Где-то здесь может быть ключ от сокровищницы.',
         'exits': {'east': 'hall', 'north': 'armory'},
-        'items': ['ancient_book'],
+        'items': ('ancient_book',),
         'puzzle': ('В одном свитке загадка: "Что растет, когда его съедают?" '
                    '(ответ одно слово)', 'резонанс'),
         'reward': 'treasure_key'
@@ -42,7 +42,7 @@ ROOMS = {
         'description': 'Старая оружейная комната. На стене висит меч, '
                        'рядом — небольшая бронзовая шкатулка.',
         'exits': {'south': 'library', 'west': 'garden'},
-        'items': ['sword', 'bronze_box'],
+        'items': ('sword', 'bronze_box'),
         'puzzle': None,
         'reward': None
     },
@@ -50,7 +50,7 @@ ROOMS = {
         'description': 'Комната, на столе большой сундук. '
                        'Дверь заперта — нужен особый ключ.',
         'exits': {'south': 'hall'},
-        'items': ['treasure_chest'],
+        'items': ('treasure_chest',),
         'puzzle': ('Дверь защищена кодом. Введите код '
                    '(подсказка: это число пятикратного шага, 2*5= ? )', '10'),
         'reward': None
@@ -59,7 +59,7 @@ ROOMS = {
         'description': 'Пещера, сверкающая кристаллами. В центре — пруд '
                        'с мерцающей водой. Над прудом висит зеркало.',
         'exits': {'west': 'hall', 'south': 'garden'},
-        'items': ['blue_crystal', 'silver_mirror'],
+        'items': ('blue_crystal', 'silver_mirror'),
         'puzzle': ('Надпись на стене: "Я легок как перо, '
                    'но меня нельзя долго удержать. Что я?"', 'дыхание'),
         'reward': 'crystal_shard'
@@ -68,7 +68,7 @@ ROOMS = {
         'description': 'Подземный сад со светящимися цветами. '
                        'В углу — засохший фонтан.',
         'exits': {'north': 'crystal_cave', 'east': 'secret_passage'},
-        'items': ['glowing_flower'],
+        'items': ('glowing_flower',),
         'puzzle': ('Над фонтаном надпись: "Что принадлежит тебе, '
                    'но другие используют это чаще?"', 'имя'),
         'reward': 'magic_seed'
@@ -77,13 +77,16 @@ ROOMS = {
         'description': 'Узкий темный коридор. На стенах — древние фрески. '
                        'В конце — массивная дверь.',
         'exits': {'west': 'garden'},
-        'items': ['ancient_scroll'],
+        'items': ('ancient_scroll',),
         'puzzle': ('На фреске загадка: "Чем больше берешь, '
                    'тем больше оставляешь. Что это?"', 'следы'),
         'reward': 'ancient_map'
     }
 }
 
+# Направления движения (каждое - отдельная односложная команда)
+DIRECTIONS = ('north', 'south', 'east', 'west')
+
 # Описания команд
 COMMANDS = {
     'move': ['идти', 'go', 'move', 'walk'],
@@ -93,7 +96,9 @@ COMMANDS = {
     'inventory': ['инвентарь', 'inventory', 'items'],
     'take': ['взять', 'take', 'pick'],
     'use': ['использовать', 'use', 'применить'],
-    'solve': ['решить', 'solve', 'ответить']
+    'solve': ['решить', 'solve', 'ответить'],
+    'goto': ['goto', 'перейти', 'дойти'],
+    'map': ['map', 'карта']
 }
 
 # Сообщения игры
@@ -108,6 +113,14 @@ MESSAGES = {
     'item_used': 'Вы использовали: {item}'
 }
 
+# Приглашения к вводу: команда или ответ на заданный игре вопрос
+PROMPTS = {
+    'command': '\nВведите команду: ',
+    'puzzle': 'Ваш ответ: ',
+    'treasure_choice': 'Ввести код? (да/нет): ',
+    'treasure_code': 'Введите код: '
+}
+
 # Описания предметов
 ITEM_DESCRIPTIONS = {
     'torch': 'Старый факел. Может пригодиться в темных местах.',
@@ -124,6 +137,35 @@ ITEM_DESCRIPTIONS = {
     'coin': 'Блестящая золотая монетка'
 }
 
+# Действия предметов при использовании (см. items): {предмет: описание}.
+# text выводится всегда; gives - предмет, который появляется в инвентаре,
+# если его еще нет (found - текст находки, empty - текст, если он уже есть)
+ITEM_EFFECTS = {
+    'torch': {'text': ' Вы зажгли факел. Стало светлее.'},
+    'sword': {'text': ' Вы почувствовали уверенность, держа меч в руках.'},
+    'bronze_box': {'text': ' Вы открыли бронзовую шкатулку.',
+                   'gives': 'rusty_key',
+                   'found': 'Внутри вы нашли ржавый ключ!',
+                   'empty': 'Шкатулка пуста.'},
+    'rusty_key': {'text': ' Ржавый ключ. Возможно, он подойдет к какой-то двери.'},
+    'ancient_book': {'text': ' Вы пролистали древнюю книгу, '
+                             'но не смогли разобрать письмена.'},
+    'blue_crystal': {'text': ' Кристалл мягко светится в ваших руках.'},
+    'silver_mirror': {'text': ' В зеркале вы видите свое отражение.'},
+    'glowing_flower': {'text': ' Цветок излучает мягкий свет.'},
+    'ancient_scroll': {'text': ' Свиток покрыт древними символами, '
+                               'которые вы не можете прочитать.'},
+}
+
+# Комнаты, вход в которые требует предмета: {комната: описание}. item -
+# нужный предмет, opened - текст при проходе (по умолчанию общий)
+DOOR_REQUIREMENTS = {
+    'treasure_room': {'item': 'rusty_key',
+                      'opened': '\n                Вы используете найденный ключ,'
+                                '\n                чтобы открыть путь в комнату '
+                                'сокровищ.\n                '},
+}
+
 # Загадки и их решения
 PUZZLES = {
     'hall': ('10', 'десять'),
@@ -139,6 +181,8 @@ PUZZLES = {
 COMMANDS_HELP = {
     "north/south/east/west": "перейти в направлении",
     "go <direction>": "перейти в направлении",
+    "goto <room>": "дойти до комнаты кратчайшим путем",
+    "map": "карта посещенных комнат",
     "look": "осмотреть текущую комнату",
     "take <item>": "поднять предмет",
     "use <item>": "использовать предмет",
@@ -0,0 +1,207 @@
+# События игры: результат команды в виде данных, а не текста
+#
+# Действия игрока сообщают, что произошло, через emit. Текст для игрока
+# строится из события по каталогу EVENT_TYPES, а если сессия собирает
+# события (game_state.events - список), событие еще и попадает туда. Бот
+# или сервер получает результат команды без разбора русского текста.
+#
+# Событие - кортеж (имя, значения полей...), поля перечислены в каталоге.
+# Справка и карта приходят готовым текстом в событии text; приветствие -
+# просто текст, события у него нет.
+from .constants import PROMPTS
+from .items import session_rules
+from .output import say
+from .world import room_text
+
+
+def _render_room(game_state, room_name, *_):
+    # Текст берется из кэша описаний, остальные поля - для ботов
+    say(game_state, room_text(game_state, room_name), end='')
+
+
+def _render_text(game_state, *values):
+    """Текст из последнего поля события; None - текста нет"""
+    text = values[-1]
+    if text is not None:
+        say(game_state, text)
+
+
+def _render_inventory(game_state, items):
+    if not items:
+        say(game_state, "\nВаш инвентарь пуст.")
+        return
+    say(game_state, "\n Ваш инвентарь:")
+    for i, item in enumerate(items, 1):
+        say(game_state, f"  {i}. {item}")
+
+
+def _render_noise(game_state, armed):
+    say(game_state, "Вы слышите странный шорох из темноты...")
+    if armed:
+        say(game_state, "Вы достаете меч, и существо отступает!")
+    else:
+        say(game_state, "Вам становится не по себе...")
+
+
+def _render_gained(game_state, item, source, text):
+    if source == 'reward':
+        say(game_state, f"Вы получили награду: {item}")
+    elif text is not None:
+        # Предмет нашелся в другом предмете: текст находки - у него
+        say(game_state, text)
+
+
+def _render_door(game_state, room_name, key):
+    say(game_state, session_rules(game_state).door_text(room_name, key))
+
+
+def _render_prompt(game_state, prompt):
+    say(game_state, PROMPTS[prompt], end='')
+
+
+def _render_choice(texts):
+    """Текст по первому полю события; для отсутствующих значений текста нет"""
+    def render(game_state, key, *_):
+        text = texts.get(key)
+        if text is not None:
+            say(game_state, text)
+    return render
+
+
+MISSING_ARGUMENT_TEXTS = {
+    'move': "Укажите направление: идти [north/south/east/west]",
+    'goto': "Укажите комнату: goto [название комнаты]",
+    'take': "Укажите предмет: взять [название предмета]",
+    'use': "Укажите предмет: использовать [название предмета]",
+}
+
+# Почему закончилась игра; победу объявляет treasure_opened
+GAME_OVER_TEXTS = {
+    'trap': "Ловушка нанесла смертельный урон! Игра окончена.",
+    'quit': "Спасибо за игру! До свидания!",
+}
+
+# Каталог событий: имя -> (поля, текст). Текст - шаблон str.format по
+# полям, функция (game_state, *значения), которая сама выводит текст, или
+# None, если текста у события нет
+EVENT_TYPES = {
+    # Комнаты и перемещение
+    # puzzle - есть ли в комнате нерешенная загадка
+    'room': (('room', 'description', 'items', 'exits', 'puzzle'), _render_room),
+    'moved': (('direction', 'room'), None),
+    'no_exit': (('direction',), "Нельзя пойти в этом направлении."),
+    'door_locked': (('room', 'key'),
+                    "Дверь заперта. Нужен ключ, чтобы пройти дальше."),
+    'door_opened': (('room', 'key'), _render_door),
+    'unknown_room': (('room',), "Такой комнаты нет."),
+    'already_here': (('room',), "Вы уже здесь."),
+    'no_route': (('room',), "Туда не пройти отсюда."),
+
+    # Предметы
+    'inventory': (('items',), _render_inventory),
+    'item_taken': (('item',), "Вы подняли: {item}"),
+    'item_too_heavy': (('item',),
+                       "Вы не можете поднять сундук, он слишком тяжелый."),
+    'item_missing': (('item',), "Такого предмета здесь нет."),
+    'item_not_held': (('item',), "У вас нет такого предмета."),
+    # Тексты действий предметов - из items.ItemRules.effects
+    'item_used': (('item', 'text'), _render_text),
+    'item_unusable': (('item',), "Вы не знаете, как использовать {item}."),
+    'item_gained': (('item', 'source', 'text'), _render_gained),
+    'item_empty': (('item', 'text'), _render_text),
+    'item_lost': (('item',), "Вы потеряли предмет: {item}"),
+    'coin_found': (('room',), "Вы нашли на полу блестящую монетку!"),
+
+    # Случайные события и ловушки
+    'noise': (('armed',), _render_noise),
+    'danger': (('room',), "Вы чувствуете опасность..."),
+    'trap_triggered': (('room',), "Ловушка активирована! Пол стал дрожать..."),
+    'trap_dodged': ((), "Вам удалось увернуться от ловушки!"),
+
+    # Загадки
+    'no_puzzle': (('room',), "Загадок здесь нет."),
+    'puzzle_already_solved': (('room',), "Вы уже решили загадку в этой комнате."),
+    'puzzle_asked': (('room', 'question'), "Загадка: {question}"),
+    'puzzle_solved': (('room',), "Правильно! Загадка решена!"),
+    'puzzle_failed': (('room',), "Неверно. Попробуйте снова."),
+
+    # Сундук с сокровищами
+    'no_chest': (('room',), "Здесь нет сундука с сокровищами."),
+    'chest_unlocked': (('key',),
+                       "Вы применяете ключ, и замок щёлкает. Сундук открыт!"),
+    'chest_locked': ((), "Сундук заперт. У вас нет ключа."),
+    'chest_left': ((), "Вы отступаете от сундука."),
+    'code_accepted': ((), "Код верный! Сундук открыт!"),
+    'code_rejected': ((), "Неверный код. Сундук остается запертым."),
+    'treasure_opened': ((), "В сундуке сокровище! Вы победили!"),
+    'game_over': (('reason',), _render_choice(GAME_OVER_TEXTS)),
+
+    # Справка и карта (topic - 'help' или 'map')
+    'text': (('topic', 'text'), _render_text),
+
+    # Ввод команд
+    'missing_argument': (('command',), _render_choice(MISSING_ARGUMENT_TEXTS)),
+    'invalid_direction': (('direction',),
+                          "Неверное направление. Используйте: "
+                          "north/south/east/west)"),
+    'unknown_command': (('command',),
+                        "Неизвестная команда. Введите 'help' для списка команд."),
+
+    # Сессии сервера и приглашение к вводу (ключ из PROMPTS)
+    'session_started': (('session_id',),
+                        "Код сессии: {session_id}. Чтобы вернуться к "
+                        "сохраненной игре, введите resume <код>."),
+    'session_resumed': (('session_id',), None),
+    'session_not_found': (('session_id',),
+                          "Сохраненная сессия не найдена, начинаем новую игру."),
+    'prompt': (('prompt',), _render_prompt),
+}
+
+
+def emit(game_state, kind, *values):
+    """
+    Сообщает о событии: выводит его текст и, если сессия собирает
+    события, добавляет его в game_state.events
+
+    Args:
+        kind (str): Имя события из EVENT_TYPES
+        values: Значения полей события по порядку
+    """
+    events = game_state.events if game_state is not None else None
+    if events is not None:
+        events.append((kind, *values))
+    fields, text = EVENT_TYPES[kind]
+    if text is None:
+        return
+    if isinstance(text, str):
+        if fields:
+            text = text.format(**dict(zip(fields, values)))
+        say(game_state, text)
+    else:
+        text(game_state, *values)
+
+
+def take_events(game_state):
+    """Собранные события сессии; список очищается"""
+    events = game_state.events
+    taken = events[:]
+    events.clear()
+    return taken
+
+
+def event_dict(event):
+    """Событие в виде словаря: {'event': имя, поле: значение, ...}"""
+    kind, *values = event
+    return {'event': kind, **dict(zip(EVENT_TYPES[kind][0], values))}
+
+
+def encode_events(events):
+    """
+    События одной строкой JSON на каждое: ["имя", значения...]. Кортежи
+    (например, инвентарь) становятся списками.
+    """
+    # json нужен только серверу в режиме событий: его импорт заметно
+    # удлиняет запуск игры в терминале
+    import json
+    return ''.join(json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+                   + '\n' for event in events).encode()
@@ -0,0 +1,203 @@
+# Генератор больших лабиринтов для нагрузочных тестов
+#
+# Комнаты лежат на сетке width x height и нумеруются построчно. Каждая
+# комната, кроме входа, прокладывает проход на запад или на юг (лабиринт
+# "двоичное дерево"), поэтому все комнаты связаны. Часть комнат получает
+# дополнительный проход, образуя циклы. Все решения принимаются по хэшу
+# (зерно, номер комнаты), так что любую комнату можно построить отдельно,
+# а мир выдается потоком без хранения в памяти.
+import argparse
+import json
+import math
+import sys
+
+from .constants import ITEM_DESCRIPTIONS, PUZZLES, ROOMS
+from .worldfile import write_world
+
+MASK = (1 << 64) - 1
+
+# "Соль" для независимых решений по одной и той же комнате
+CARVE, LOOP, ITEMS, PUZZLE, REWARD, DESCRIPTION, SPECIAL = range(7)
+
+# Предметы, которые можно найти в обычных комнатах
+ITEM_POOL = tuple(item for item in ITEM_DESCRIPTIONS
+                  if item not in ('treasure_chest', 'treasure_key', 'rusty_key'))
+
+# Загадки встроенного мира: (вопрос, ответы), кроме кода сундука
+PUZZLE_POOL = tuple((ROOMS[room_name]['puzzle'][0], answers)
+                    for room_name, answers in PUZZLES.items()
+                    if room_name != 'treasure_room')
+
+REWARD_POOL = tuple(sorted({room_data['reward'] for room_data in ROOMS.values()
+                            if room_data['reward']}))
+
+DESCRIPTIONS = (
+    'Сырой каменный коридор. С потолка капает вода.',
+    'Небольшой зал с обвалившейся колонной.',
+    'Узкая галерея, стены покрыты странными знаками.',
+    'Комната с высоким сводом. Где-то далеко слышно эхо.',
+    'Темный закуток, пахнет плесенью и старым деревом.',
+    'Круглая комната с мозаикой на полу.',
+)
+
+TREASURE_ROOM = ROOMS['treasure_room']
+TRAP_ROOM = ROOMS['trap_room']
+
+
+def mix(seed, index, salt):
+    """Хэш splitmix64 от (зерно, номер комнаты, соль)"""
+    x = (seed * 0x9E3779B97F4A7C15 + index * 0xBF58476D1CE4E5B9
+         + salt * 0x94D049BB133111EB) & MASK
+    x ^= x >> 30
+    x = (x * 0xBF58476D1CE4E5B9) & MASK
+    x ^= x >> 27
+    x = (x * 0x94D049BB133111EB) & MASK
+    return x ^ (x >> 31)
+
+
+def chance(seed, index, salt):
+    """Детерминированное число из [0, 1) для комнаты"""
+    return mix(seed, index, salt) / 2 ** 64
+
+
+class WorldPlan:
+    """
+    Параметры мира: по ним любая комната строится независимо от других
+    """
+
+    def __init__(self, rooms, seed=0, loop_rate=0.1, item_rate=0.3,
+                 puzzle_rate=0.2):
+        if rooms < 3:
+            raise ValueError("В мире должно быть хотя бы 3 комнаты")
+        self.rooms = rooms
+        self.seed = seed
+        self.width = math.isqrt(rooms - 1) + 1
+        self.loop_rate = loop_rate
+        self.item_rate = item_rate
+        self.puzzle_rate = puzzle_rate
+        # Особые комнаты: вход первый, сокровищница последняя,
+        # комната-ловушка (с ржавым ключом) - где-то между ними
+        self.treasure_index = rooms - 1
+        self.trap_index = 1 + mix(seed, 0, SPECIAL) % (rooms - 2)
+
+    def name(self, index):
+        """Имя комнаты по номеру"""
+        if index == 0:
+            return 'entrance'
+        if index == self.treasure_index:
+            return 'treasure_room'
+        if index == self.trap_index:
+            return 'trap_room'
+        return f'room_{index}'
+
+    def carves_west(self, index):
+        """Куда комната прокладывает основной проход: на запад или на юг"""
+        x, y = index % self.width, index // self.width
+        if y == 0:
+            return True
+        if x == 0:
+            return False
+        return mix(self.seed, index, CARVE) & 1 == 1
+
+    def has_loop(self, index):
+        """Прокладывает ли комната второй проход (цикл)"""
+        x, y = index % self.width, index // self.width
+        return x > 0 and y > 0 and chance(self.seed, index, LOOP) < self.loop_rate
+
+    def opens_west(self, index):
+        return index % self.width > 0 and (
+            self.carves_west(index) or self.has_loop(index))
+
+    def opens_south(self, index):
+        return index >= self.width and (
+            not self.carves_west(index) or self.has_loop(index))
+
+    def exits(self, index):
+        """Выходы комнаты: ее проходы и проходы соседей в нее"""
+        exits = {}
+        north, east = index + self.width, index + 1
+        if north < self.rooms and self.opens_south(north):
+            exits['north'] = self.name(north)
+        if self.opens_south(index):
+            exits['south'] = self.name(index - self.width)
+        if (east < self.rooms and east % self.width > 0
+                and self.opens_west(east)):
+            exits['east'] = self.name(east)
+        if self.opens_west(index):
+            exits['west'] = self.name(index - 1)
+        return exits
+
+    def room(self, index):
+        """Комната в схеме ROOMS"""
+        if index == self.treasure_index:
+            return {**TREASURE_ROOM, 'exits': self.exits(index)}
+
+        items = []
+        if index == self.trap_index:
+            items.append('rusty_key')
+        if chance(self.seed, index, ITEMS) < self.item_rate:
+            items.append(ITEM_POOL[mix(self.seed, index, ITEMS) % len(ITEM_POOL)])
+
+        room = {
+            'description': DESCRIPTIONS[
+                mix(self.seed, index, DESCRIPTION) % len(DESCRIPTIONS)],
+            'exits': self.exits(index),
+            'items': tuple(items),
+            'puzzle': None,
+            'reward': None
+        }
+        if index == self.trap_index:
+            room['description'] = TRAP_ROOM['description']
+            room['puzzle'] = TRAP_ROOM['puzzle']
+            room['answers'] = PUZZLES['trap_room']
+            room['reward'] = TRAP_ROOM['reward']
+        elif index and chance(self.seed, index, PUZZLE) < self.puzzle_rate:
+            question, answers = PUZZLE_POOL[
+                mix(self.seed, index, PUZZLE) % len(PUZZLE_POOL)]
+            room['puzzle'] = (question, answers[0])
+            room['answers'] = answers
+            room['reward'] = REWARD_POOL[
+                mix(self.seed, index, REWARD) % len(REWARD_POOL)]
+        return room
+
+    def meta(self):
+        return {'start': 'entrance', 'generator': 'grid', 'rooms': self.rooms,
+                'seed': self.seed, 'width': self.width}
+
+
+def generate_world(rooms, seed=0, **options):
+    """
+    Выдает комнаты мира потоком пар (имя, комната)
+    """
+    plan = WorldPlan(rooms, seed, **options)
+    for index in range(rooms):
+        yield plan.name(index), plan.room(index)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Генератор больших лабиринтов")
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--loop-rate', type=float, default=0.1,
+                        help="доля комнат с дополнительным проходом")
+    parser.add_argument('--item-rate', type=float, default=0.3)
+    parser.add_argument('--puzzle-rate', type=float, default=0.2)
+    parser.add_argument('-o', '--output', default='-',
+                        help="файл мира (.labw) или '-' для JSON Lines в stdout")
+    args = parser.parse_args(argv)
+
+    options = {'loop_rate': args.loop_rate, 'item_rate': args.item_rate,
+               'puzzle_rate': args.puzzle_rate}
+    plan = WorldPlan(args.rooms, args.seed, **options)
+    rooms = generate_world(args.rooms, args.seed, **options)
+    if args.output == '-':
+        for room_name, room_data in rooms:
+            sys.stdout.write(json.dumps({'name': room_name, **room_data},
+                                        ensure_ascii=False) + '\n')
+    else:
+        write_world(args.output, rooms, plan.meta())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# Спячка сессий: давно не активные сессии выгружаются на диск
+#
+# Большинство подключений к серверу большую часть времени молчат, а их
+# инвентарь, посещенные комнаты и изменения мира лежат в памяти. Hibernation
+# держит в памяти не больше заданного числа сессий: при превышении самая
+# давно активная сессия пишется на диск снимком (persistence.encode_snapshot)
+# и отпускает свои коллекции. Скалярные поля (комната, вопрос, конец игры)
+# остаются в объекте, поэтому обработчик подключения продолжает работать с
+# тем же game_state, а перед следующей командой touch поднимает его с диска.
+#
+# Выгрузка происходит только внутри touch другой сессии, то есть пока эта
+# сессия ждет ввода: между touch и концом обработки команды цикл событий не
+# переключается, и состояние не может уйти в спячку посреди команды.
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict, deque
+
+from .persistence import decode_snapshot, encode_snapshot
+from .session import release_state, restore_state
+
+# Сколько последних замеров подъема с диска хранить для перцентилей
+LATENCY_WINDOW = 10_000
+
+
+class Hibernation:
+    """
+    Сессии сервера в памяти и в спячке (LRU по последней команде)
+
+    Args:
+        max_resident (int): Сколько сессий держать в памяти
+        directory (str): Каталог для спящих сессий; по умолчанию временный,
+            удаляется в close
+        metrics: Реестр метрик (metrics.Metrics) или None
+    """
+
+    def __init__(self, max_resident, directory=None, metrics=None):
+        if max_resident < 1:
+            raise ValueError("max_resident должен быть не меньше 1")
+        self.max_resident = max_resident
+        self.own_directory = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix='labyrinth-sessions-')
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.metrics = metrics
+        # Ключ - id(game_state): объект живет, пока жив обработчик сессии
+        self.resident = OrderedDict()
+        self.sleeping = set()
+        self.hits = self.misses = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key:x}.snap')
+
+    def touch(self, game_state):
+        """
+        Сессия получила команду: поднимает ее с диска, если она спит,
+        и отмечает как самую недавно активную
+        """
+        key = id(game_state)
+        if key in self.resident:
+            self.resident.move_to_end(key)
+            self.hits += 1
+            self.count('hit')
+            return
+
+        if key in self.sleeping:
+            started = time.perf_counter()
+            self.wake(key, game_state)
+            elapsed = time.perf_counter() - started
+            self.misses += 1
+            self.latencies.append(elapsed)
+            self.count('miss')
+            if self.metrics:
+                self.metrics.observe_timing('rehydrate', elapsed)
+        self.resident[key] = game_state
+        while len(self.resident) > self.max_resident:
+            self.hibernate(*self.resident.popitem(last=False))
+        self.update_gauges()
+
+    def forget(self, game_state):
+        """
+        Сессия завершилась: возвращает ей состояние (например, для
+        итогового снимка журнала) и перестает ее учитывать
+        """
+        key = id(game_state)
+        if key in self.sleeping:
+            self.wake(key, game_state)
+        self.resident.pop(key, None)
+        self.update_gauges()
+
+    def hibernate(self, key, game_state):
+        # Файл нужен только этому процессу, поэтому без fsync: снимок
+        # в пару сотен байт остается в кэше страниц
+        with open(self.path(key), 'wb') as f:
+            f.write(encode_snapshot(game_state))
+        release_state(game_state)
+        self.sleeping.add(key)
+
+    def wake(self, key, game_state):
+        path = self.path(key)
+        with open(path, 'rb') as f:
+            restore_state(game_state, decode_snapshot(f.read()))
+        os.remove(path)
+        self.sleeping.discard(key)
+
+    def count(self, result):
+        if self.metrics:
+            self.metrics.count('session_lookup', result)
+
+    def update_gauges(self):
+        if self.metrics:
+            self.metrics.set_gauge('resident', len(self.resident))
+            self.metrics.set_gauge('hibernated', len(self.sleeping))
+
+    def percentile(self, p):
+        """Перцентиль времени подъема с диска в секундах"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 100.0
+        return (f"в памяти: {len(self.resident)}, в спячке: {len(self.sleeping)}, "
+                f"попаданий: {hit_rate:.1f}%, подъем с диска "
+                f"p50={self.percentile(50) * 1000:.3f} мс, "
+                f"p99={self.percentile(99) * 1000:.3f} мс")
+
+    def close(self):
+        """Удаляет временный каталог спящих сессий"""
+        if self.own_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
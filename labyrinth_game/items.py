@@ -0,0 +1,83 @@
+# Правила предметов: действия при использовании и двери, требующие предмета
+#
+# Правила заданы данными (ITEM_EFFECTS и DOOR_REQUIREMENTS в constants) и
+# один раз на мир собираются в таблицы: использование предмета и проверка
+# двери - один поиск в словаре, сколько бы типов предметов ни было в мире.
+# Файл мира может добавить или переопределить правила в meta под ключами
+# 'item_effects' и 'door_requirements' в том же формате.
+import sys
+
+from .constants import DOOR_REQUIREMENTS, ITEM_EFFECTS
+from .world import get_world
+
+# Текст при проходе через дверь, у которой нет своего
+DEFAULT_DOOR_TEXT = "Вы используете {key}, и дверь открывается."
+
+
+class ItemRules:
+    """
+    Собранные правила предметов одного мира
+
+    Имена предметов и комнат в таблицах интернированы: строки из мира и
+    из команд игрока сравниваются с ними при поиске в словаре.
+    """
+
+    def __init__(self, world, effects, doors):
+        self.world = world
+        # {предмет: (текст, что дает, текст находки, текст "уже есть")}
+        self.effects = {}
+        # {предмет: что дает} - только предметы, которые что-то дают
+        self.gives = {}
+        for item, spec in effects.items():
+            item = sys.intern(item)
+            gives = spec.get('gives')
+            if gives:
+                gives = self.gives[item] = sys.intern(gives)
+            self.effects[item] = (spec.get('text'), gives, spec.get('found'),
+                                  spec.get('empty'))
+
+        # {комната: нужный предмет} и {комната: текст при проходе}
+        self.doors = {}
+        self.door_texts = {}
+        for room_name, spec in doors.items():
+            room_name = sys.intern(room_name)
+            self.doors[room_name] = sys.intern(spec['item'])
+            if spec.get('opened') is not None:
+                self.door_texts[room_name] = spec['opened']
+        # Все предметы, открывающие двери
+        self.keys = frozenset(self.doors.values())
+
+    def door_text(self, room_name, key):
+        text = self.door_texts.get(room_name)
+        return text if text is not None else DEFAULT_DOOR_TEXT.format(key=key)
+
+
+# Кэш правил по мирам: {id(мира): ItemRules}
+_RULES = {}
+
+
+def get_rules(world):
+    """
+    Правила предметов мира: встроенные плюс правила из meta файла мира
+    (собираются один раз и кэшируются)
+    """
+    rules = _RULES.get(id(world))
+    if rules is None or rules.world is not world:
+        meta = getattr(world, 'meta', None) or {}
+        rules = _RULES[id(world)] = ItemRules(
+            world, {**ITEM_EFFECTS, **meta.get('item_effects', {})},
+            {**DOOR_REQUIREMENTS, **meta.get('door_requirements', {})})
+    return rules
+
+
+def invalidate_rules(world=None):
+    """Забывает собранные правила мира (или всех миров)"""
+    if world is None:
+        _RULES.clear()
+    else:
+        _RULES.pop(id(world), None)
+
+
+def session_rules(game_state):
+    """Правила предметов мира, на котором играет сессия"""
+    return get_rules(get_world(game_state))
@@ -0,0 +1,122 @@
+# Нагрузочный тест: задержка команд на сервере и в режиме "процесс на игрока"
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+PROMPT_MARKER = "Введите команду: ".encode()
+
+# То же приглашение у сервера в режиме событий (--events)
+EVENTS_PROMPT_MARKER = b'["prompt","command"]\n'
+
+# Сценарий игрока, который не требует ответов на загадки
+SCRIPT = ('look', 'go north', 'go south', 'inventory',
+          'go east', 'go west', 'take torch', 'help')
+
+
+async def read_until_prompt(reader, marker=PROMPT_MARKER):
+    """Читает вывод до очередного приглашения к вводу"""
+    await reader.readuntil(marker)
+
+
+async def play(reader, writer, commands, latencies, pipeline=1,
+               marker=PROMPT_MARKER):
+    """
+    Проигрывает сценарий и записывает задержку каждой команды
+
+    Args:
+        pipeline (int): Сколько команд отправлять одной записью, не дожидаясь
+            ответов; задержкой каждой считается время ответа на весь пакет
+        marker (bytes): Приглашение, которым заканчивается ответ
+    """
+    await read_until_prompt(reader, marker)
+    for first in range(0, commands, pipeline):
+        count = min(pipeline, commands - first)
+        lines = ''.join(SCRIPT[i % len(SCRIPT)] + "\n"
+                        for i in range(first, first + count))
+        started = time.perf_counter()
+        writer.write(lines.encode())
+        await writer.drain()
+        try:
+            for _ in range(count):
+                await read_until_prompt(reader, marker)
+        except asyncio.IncompleteReadError:
+            # Игра закончилась раньше сценария (например, ловушка)
+            return
+        latencies += [time.perf_counter() - started] * count
+    writer.write(b"quit\n")
+    await writer.drain()
+
+
+async def server_session(args, latencies):
+    """Одна сессия на сетевом сервере"""
+    if args.unix:
+        reader, writer = await asyncio.open_unix_connection(args.unix)
+    else:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+    try:
+        marker = EVENTS_PROMPT_MARKER if args.events else PROMPT_MARKER
+        await play(reader, writer, args.commands, latencies, args.pipeline,
+                   marker)
+    finally:
+        writer.close()
+
+
+async def process_session(args, latencies):
+    """Одна сессия в отдельном процессе `python -m labyrinth_game.main`"""
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, '-m', 'labyrinth_game.main',
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE)
+    try:
+        await play(proc.stdout, proc.stdin, args.commands, latencies,
+                   args.pipeline)
+    finally:
+        proc.stdin.close()
+        await proc.wait()
+
+
+async def run(args):
+    latencies = []
+    session = process_session if args.baseline else server_session
+    started = time.perf_counter()
+    await asyncio.gather(*(session(args, latencies)
+                           for _ in range(args.sessions)))
+    elapsed = time.perf_counter() - started
+    return latencies, elapsed
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест Лабиринта")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8023)
+    parser.add_argument('--unix', help="путь к Unix-сокету сервера")
+    parser.add_argument('--sessions', type=int, default=100,
+                        help="число одновременных игроков")
+    parser.add_argument('--commands', type=int, default=50,
+                        help="команд на одного игрока")
+    parser.add_argument('--pipeline', type=int, default=1,
+                        help="команд в одной отправке (не дожидаясь ответов)")
+    parser.add_argument('--events', action='store_true',
+                        help="сервер запущен с --events (ответы - события JSON)")
+    parser.add_argument('--baseline', action='store_true',
+                        help="запускать отдельный процесс на каждого игрока")
+    args = parser.parse_args(argv)
+
+    latencies, elapsed = asyncio.run(run(args))
+    mode = "процесс на игрока" if args.baseline else "сервер"
+    print(f"Режим: {mode}, сессий: {args.sessions}, "
+          f"ядер: {os.cpu_count()}")
+    print(f"Команд: {len(latencies)} за {elapsed:.2f} с "
+          f"({len(latencies) / elapsed:.0f} команд/с)")
+    print(f"p50={percentile(latencies, 50) * 1000:.2f} мс, "
+          f"p99={percentile(latencies, 99) * 1000:.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
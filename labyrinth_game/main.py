@@ -1,67 +1,207 @@
 #!/usr/bin/env python3
+import sys
+import time
+from types import SimpleNamespace
+
+from .commands import enable_tab_completion
+from .events import emit
+from .metrics import Metrics, start_http_server
+from .output import StdoutSink, flush_output, say
 from .player_actions import (
     get_input,
+    goto_room,
     move_player,
     show_inventory,
-    solve_puzzle,
     take_item,
     use_item,
 )
+from .session import new_game_state
 from .utils import (
+    answer_prompt,
     attempt_open_treasure,
     describe_current_room,
+    get_command_type,
+    get_prompt,
     is_valid_direction,
     parse_command,
     show_help,
+    show_map,
+    show_prompt,
+    solve_puzzle,
 )
 
 
-def process_command(game_state, user_input):
+def process_command(game_state, user_input, events=False):
+    """
+    Обрабатывает команду пользователя (см. handle_command)
+
+    Если в сессии включены метрики, учитывает тип и время команды.
+
+    Returns:
+        Тип команды, а с events=True - список событий, которые она вызвала
+        (см. events.EVENT_TYPES); текст команды выводится как обычно
+    """
+    if events:
+        return _command_events(game_state, user_input)
+    metrics = game_state.metrics
+    if metrics is None:
+        return handle_command(game_state, user_input)
+    
+    started = time.perf_counter()
+    command_type = handle_command(game_state, user_input)
+    metrics.observe_command(command_type, time.perf_counter() - started)
+    return command_type
+
+
+def _command_events(game_state, user_input):
+    """
+    Выполняет команду, собирая ее события
+
+    Если сессия уже собирает события, возвращаются только новые, и из
+    собранного списка они забираются.
+    """
+    collected = game_state.events
+    if collected is None:
+        game_state.events = []
+        try:
+            process_command(game_state, user_input)
+            return game_state.events
+        finally:
+            game_state.events = None
+    start = len(collected)
+    process_command(game_state, user_input)
+    taken = collected[start:]
+    del collected[start:]
+    return taken
+
+
+def split_commands(text):
+    """
+    Разбивает пакет ввода на команды: по строкам и по ';' внутри строки
+
+    Пустая строка остается командой (как при вводе по одной: пустой ответ
+    на вопрос допустим), а пустые куски между ';' отбрасываются.
+    """
+    commands = []
+    for line in text.splitlines() or ['']:
+        if ';' in line:
+            commands += [part.strip() for part in line.split(';') if part.strip()]
+        else:
+            commands.append(line.strip())
+    return commands
+
+
+def run_commands(game_state, commands, echo=False, on_command=None):
+    """
+    Выполняет пакет команд как одно целое; останавливается, как только
+    игра закончилась
+
+    Вывод копится в приемнике сессии и уходит одним flush_output у
+    вызывающего кода. Перед каждой командой, кроме первой, выводится
+    приглашение, поэтому вывод пакета совпадает с выводом тех же команд,
+    введенных по одной.
+
+    Args:
+        echo (bool): Печатать команду после приглашения (терминал показал
+            только первую строку пакета)
+        on_command: Вызывается после каждой выполненной команды с
+            аргументами (команда, секунды)
+
+    Returns:
+        int: Сколько команд выполнено
+    """
+    executed = 0
+    for i, user_input in enumerate(commands):
+        if game_state.game_over:
+            break
+        if i:
+            show_prompt(game_state)
+            if echo:
+                say(game_state, user_input)
+        # Пустая строка вне вопроса ничего не делает
+        if not user_input and not game_state.pending_prompt:
+            continue
+        if on_command is None:
+            process_command(game_state, user_input)
+        else:
+            started = time.perf_counter()
+            process_command(game_state, user_input)
+            on_command(user_input, time.perf_counter() - started)
+        executed += 1
+    return executed
+
+
+def handle_command(game_state, user_input):
     """
     Обрабатывает команду пользователя
+
+    Вывод копится в приемнике сессии; отправляет его вызывающий код
+    через flush_output. Если игра задала вопрос (загадка, код сундука),
+    строка считается ответом на него.
+
+    Returns:
+        str: Тип команды ('answer' для ответа на вопрос, 'unknown' для
+            нераспознанной)
     """
+    if game_state.pending_prompt:
+        answer_prompt(game_state, user_input)
+        return 'answer'
+    
     # Разделяем строку на команду и аргумент
     command, argument = parse_command(user_input)
     
+    # Тип команды по синониму или сокращению (идти, взять, inv, n, ...)
+    command_type = get_command_type(command)
+    
     # Используем match/case для определения команды
-    match command:
+    match command_type:
         case 'look':
             describe_current_room(game_state)
         
-        case 'go':
+        case 'move':
             if not argument:
-                print("Укажите направление: идти [north/south/east/west]")
-                return
+                emit(game_state, 'missing_argument', command_type)
+                return command_type
             
             direction = argument
             if not is_valid_direction(direction):
-                print("Неверное направление. Используйте: north/south/east/west)")
-                return
+                emit(game_state, 'invalid_direction', direction)
+                return command_type
             
             move_player(game_state, direction)
         
         # Обработка односложных команд направления
         case 'north' | 'south' | 'east' | 'west':
-            direction = command
+            direction = command_type
             move_player(game_state, direction)
         
+        case 'goto':
+            if not argument:
+                emit(game_state, 'missing_argument', command_type)
+                return command_type
+            
+            goto_room(game_state, argument)
+        
+        case 'map':
+            show_map(game_state)
+        
         case 'take':
             if not argument:
-                print("Укажите предмет: взять [название предмета]")
-                return
+                emit(game_state, 'missing_argument', command_type)
+                return command_type
             
             take_item(game_state, argument)
         
         case 'use':
             if not argument:
-                print("Укажите предмет: использовать [название предмета]")
-                return
+                emit(game_state, 'missing_argument', command_type)
+                return command_type
             
             use_item(game_state, argument)
         
         case 'solve':
             # Если в комнате с сокровищами, пытаемся открыть сундук
-            if game_state['current_room'] == 'treasure_room':
+            if game_state.current_room == 'treasure_room':
                 attempt_open_treasure(game_state)
             else:
                 solve_puzzle(game_state)
@@ -69,50 +209,114 @@ def process_command(game_state, user_input):
         case 'inventory':
             show_inventory(game_state)
         
-        case 'quit' | 'exit':
-            print("Спасибо за игру! До свидания!")
-            game_state['game_over'] = True
+        case 'quit':
+            game_state.game_over = True
+            emit(game_state, 'game_over', 'quit')
         
         case 'help':
-            show_help()
+            show_help(game_state)
         
         case _:
-            print("Неизвестная команда. Введите 'help' для списка команд.")
+            emit(game_state, 'unknown_command', command)
+            return 'unknown'
+    
+    return command_type
 
 
-def main():
-    game_state = {
-        'player_inventory': [],  # Инвентарь игрока
-        'current_room': 'entrance',  # Текущая комната
-        'game_over': False,  # Значения окончания игры
-        'steps_taken': 0  # Количество шагов
-    }
-    
+def show_intro(game_state):
+    """
+    Выводит приветствие, справку и описание стартовой комнаты
+    """
     # Выводим приветственное сообщение
-    print("Добро пожаловать в Лабиринт сокровищ!")
-    show_help()
+    say(game_state, "Добро пожаловать в Лабиринт сокровищ!")
+    show_help(game_state)
     
     # Описываем стартовую комнату
     describe_current_room(game_state)
+
+
+# Ключи по умолчанию: обычный запуск игры без параметров
+DEFAULT_ARGS = SimpleNamespace(world=None, metrics_file=None, metrics_port=None,
+                               profile=None)
+
+
+def parse_args(argv):
+    """
+    Разбирает ключи командной строки
+
+    Без ключей argparse не импортируется: вместе с re и gettext он
+    занимал заметную часть времени до первого приглашения.
+    """
+    if not argv:
+        return DEFAULT_ARGS
+    import argparse
+    parser = argparse.ArgumentParser(description="Лабиринт сокровищ")
+    parser.add_argument('--world', help="файл мира (по умолчанию встроенный)")
+    parser.add_argument('--metrics-file',
+                        help="записать метрики в формате Prometheus по выходу")
+    parser.add_argument('--metrics-port', type=int,
+                        help="отдавать метрики по HTTP на этом порту")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="записать статистику cProfile за сессию")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    
+    game_state = new_game_state(world_path=args.world)
+    game_state.output = StdoutSink()
+    if args.metrics_file or args.metrics_port:
+        game_state.metrics = Metrics()
+    if args.metrics_port:
+        start_http_server(game_state.metrics, args.metrics_port)
+    # Автодополнение нужно только в терминале (readline грузится не сразу)
+    if sys.stdin.isatty():
+        enable_tab_completion()
+    
+    # Конец ввода завершает игру через SystemExit, поэтому статистика
+    # записывается в finally
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+    try:
+        if profiler:
+            profiler.runcall(play, game_state)
+        else:
+            play(game_state)
+    finally:
+        if profiler:
+            profiler.dump_stats(args.profile)
+        if args.metrics_file:
+            game_state.metrics.write_textfile(args.metrics_file)
+
+
+def play(game_state):
+    """
+    Интерактивная игра в терминале до ее окончания
+    """
+    show_intro(game_state)
     
     # Основной игровой цикл
-    while not game_state['game_over']:
+    while not game_state.game_over:
+        # Весь вывод предыдущей команды уходит в терминал одной записью
+        flush_output(game_state)
         try:
-            # Считываем команду от пользователя
-            user_input = get_input("\nВведите команду: ")
+            # Считываем команду (или ответ на вопрос) от пользователя;
+            # строка может содержать несколько команд через ';'
+            user_input = get_input(get_prompt(game_state))
             
-            # Обработка пустого ввода
-            if not user_input:
-                continue
-            
-            # Обрабатываем команду
-            process_command(game_state, user_input)
+            # Обрабатываем команды (пустой ответ на вопрос допустим)
+            run_commands(game_state, split_commands(user_input), echo=True)
                 
         except KeyboardInterrupt:
-            print("\n\nИгра прервана. До свидания!")
-            game_state['game_over'] = True
+            say(game_state, "\n\nИгра прервана. До свидания!")
+            game_state.game_over = True
         except Exception as e:
-            print(f"Произошла ошибка: {e}")
+            say(game_state, f"Произошла ошибка: {e}")
+    
+    flush_output(game_state)
 
 
 # Стандартная конструкция для запуска функции main()
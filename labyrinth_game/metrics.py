@@ -0,0 +1,180 @@
+# Метрики игры: счетчики и гистограммы задержек команд в формате Prometheus
+#
+# Реестр Metrics кладется в состояние сессии (game_state.metrics);
+# несколько сессий сервера могут делить один реестр. Без реестра
+# process_command и обработчики делают только одну проверку словаря.
+import os
+from bisect import bisect_left
+
+# Границы корзин гистограммы задержки, секунды
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+           0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Счетчики событий: имя -> (метрика, справка, имя метки)
+EVENTS = {
+    'trap': ('labyrinth_trap_triggers_total',
+             "Срабатывания ловушек", None),
+    'puzzle': ('labyrinth_puzzle_attempts_total',
+               "Попытки решить загадку", 'result'),
+    'treasure_code': ('labyrinth_treasure_code_attempts_total',
+                      "Попытки ввести код сундука", 'result'),
+    'session_lookup': ('labyrinth_session_lookups_total',
+                       "Обращения к сессиям: hit - в памяти, miss - с диска",
+                       'result'),
+}
+
+# Гистограммы прочих задержек: имя -> (метрика, справка)
+TIMINGS = {
+    'rehydrate': ('labyrinth_session_rehydrate_seconds',
+                  "Время подъема сессии из спячки"),
+}
+
+# Текущие значения: имя -> (метрика, справка)
+GAUGES = {
+    'resident': ('labyrinth_resident_sessions', "Сессии в памяти"),
+    'hibernated': ('labyrinth_hibernated_sessions', "Сессии в спячке на диске"),
+}
+
+
+def new_histogram():
+    """[сумма времени, счетчики корзин...]"""
+    return [0.0] + [0] * (len(BUCKETS) + 1)
+
+
+def observe(histogram, seconds):
+    histogram[0] += seconds
+    histogram[1 + bisect_left(BUCKETS, seconds)] += 1
+
+
+class Metrics:
+    """
+    Реестр метрик: число и задержки команд по типам, счетчики событий
+    """
+
+    def __init__(self):
+        # {тип команды: [сумма времени, счетчики корзин...]}
+        self.histograms = {}
+        self.events = {}
+        # {имя из TIMINGS: гистограмма}, {имя из GAUGES: значение}
+        self.timings = {}
+        self.gauges = {}
+
+    def observe_command(self, command_type, seconds):
+        """Учитывает выполненную команду (unknown - нераспознанная)"""
+        histogram = self.histograms.get(command_type)
+        if histogram is None:
+            histogram = self.histograms[command_type] = new_histogram()
+        observe(histogram, seconds)
+
+    def observe_timing(self, name, seconds):
+        histogram = self.timings.get(name)
+        if histogram is None:
+            histogram = self.timings[name] = new_histogram()
+        observe(histogram, seconds)
+
+    def count(self, event, label=None):
+        key = (event, label)
+        self.events[key] = self.events.get(key, 0) + 1
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def render(self):
+        """Текст в формате Prometheus (text exposition format 0.0.4)"""
+        lines = [
+            "# HELP labyrinth_commands_total Обработанные команды по типам",
+            "# TYPE labyrinth_commands_total counter",
+        ]
+        histograms = sorted((command_type, list(histogram)) for command_type,
+                            histogram in list(self.histograms.items()))
+        for command_type, histogram in histograms:
+            lines.append(f'labyrinth_commands_total{{command="{command_type}"}} '
+                         f'{sum(histogram[1:])}')
+
+        name = 'labyrinth_command_duration_seconds'
+        lines += [f"# HELP {name} Время обработки команды",
+                  f"# TYPE {name} histogram"]
+        for command_type, histogram in histograms:
+            lines += render_histogram(name, histogram,
+                                      f'command="{command_type}",')
+
+        for key, (name, help_text) in TIMINGS.items():
+            histogram = self.timings.get(key)
+            if histogram is not None:
+                lines += [f"# HELP {name} {help_text}",
+                          f"# TYPE {name} histogram"]
+                lines += render_histogram(name, list(histogram))
+
+        for key, (name, help_text) in GAUGES.items():
+            if key in self.gauges:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge",
+                          f"{name} {self.gauges[key]}"]
+
+        for event, (name, help_text, label_name) in EVENTS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            values = sorted((label, count) for (key, label), count
+                            in list(self.events.items()) if key == event)
+            if not values and label_name is None:
+                values = [(None, 0)]
+            for label, count in values:
+                labels = f'{{{label_name}="{label}"}}' if label_name else ''
+                lines.append(f'{name}{labels} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """Атомарно записывает метрики в файл (для textfile collector)"""
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(path + '.tmp', path)
+
+
+def render_histogram(name, histogram, labels=''):
+    """Строки гистограммы; labels - метки с запятой в конце или пусто"""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(BUCKETS + ('+Inf',), histogram[1:]):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+    suffix = f'{{{labels.rstrip(",")}}}' if labels else ''
+    lines.append(f'{name}_sum{suffix} {histogram[0]}')
+    lines.append(f'{name}_count{suffix} {cumulative}')
+    return lines
+
+
+def count_event(game_state, event, label=None):
+    """Учитывает игровое событие, если в сессии включены метрики"""
+    metrics = game_state.metrics
+    if metrics is not None:
+        metrics.count(event, label)
+
+
+def start_http_server(metrics, port, host='127.0.0.1'):
+    """
+    Отдает метрики по HTTP (GET /metrics) из фонового потока
+    """
+    # http.server тянет за собой email и http.client (десятки мс на
+    # запуске), поэтому загружается только когда нужен
+    import http.server
+    import threading
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
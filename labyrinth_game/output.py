@@ -0,0 +1,109 @@
+# Вывод текста игроку: буферизованные приемники сообщений сессии
+import io
+import sys
+from abc import ABC, abstractmethod
+
+
+class OutputSink(ABC):
+    """
+    Приемник вывода: копит текст одной команды и отдает его одной записью
+    """
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, text):
+        """Добавляет текст в буфер команды"""
+        self._parts.append(text)
+
+    def flush(self):
+        """Отправляет накопленный текст одной записью"""
+        if self._parts:
+            data = ''.join(self._parts)
+            self._parts.clear()
+            self._emit(data)
+
+    @abstractmethod
+    def _emit(self, data):
+        """Отправляет текст одной команды получателю"""
+
+
+class StdoutSink(OutputSink):
+    """Вывод в терминал (или в текущий sys.stdout)"""
+
+    def _emit(self, data):
+        sys.stdout.write(data)
+        sys.stdout.flush()
+
+
+class MemorySink(OutputSink):
+    """Вывод в память: для пакетного прогона, тестов и симуляций"""
+
+    def __init__(self):
+        super().__init__()
+        self.buffer = io.StringIO()
+
+    def _emit(self, data):
+        self.buffer.write(data)
+
+    def getvalue(self):
+        """Весь отправленный текст"""
+        return self.buffer.getvalue()
+
+    def take(self):
+        """Возвращает отправленный текст и очищает буфер"""
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+class NullSink(OutputSink):
+    """Отбрасывает вывод: для симуляций, где текст не нужен"""
+
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+    def _emit(self, data):
+        pass
+
+
+class SocketSink(OutputSink):
+    """
+    Вывод в сетевое соединение: asyncio.StreamWriter или обычный socket
+    """
+
+    def __init__(self, connection, encoding='utf-8'):
+        super().__init__()
+        self.connection = connection
+        self.encoding = encoding
+
+    def _emit(self, data):
+        payload = data.encode(self.encoding)
+        if hasattr(self.connection, 'sendall'):
+            self.connection.sendall(payload)
+        else:
+            self.connection.write(payload)
+
+
+def say(game_state, *values, sep=' ', end='\n'):
+    """
+    Аналог print(), пишущий в приемник вывода сессии
+
+    Если у сессии нет приемника, текст сразу печатается в stdout.
+    """
+    sink = game_state.output if game_state is not None else None
+    if sink is None:
+        print(*values, sep=sep, end=end)
+    else:
+        sink.write(sep.join(map(str, values)) + end)
+
+
+def flush_output(game_state):
+    """Отправляет накопленный вывод сессии"""
+    sink = game_state.output
+    if sink is not None:
+        sink.flush()
@@ -0,0 +1,300 @@
+# Сохранение сессий: общий журнал команд, снимки состояния и восстановление
+#
+# Команды всех сессий дописываются в общий журнал из сегментов
+# journal-<номер>.log записями JOURNAL_ENTRY (длина команды, crc32, номер
+# команды в сессии, длина кода сессии) + код сессии + текст команды.
+# Записи копятся в памяти и сбрасываются на диск пачкой с одним fsync на
+# всю пачку (group commit), сколько бы сессий в ней ни было.
+#
+# Снимок сессии <id>.snapshot хранит состояние целиком (с изменениями
+# мира) в JSON и номер последней вошедшей в него команды. Код сессии -
+# 12 шестнадцатеричных цифр (SESSION_ID_RE): другой код клиент не может
+# передать в путь к файлу. Сегмент удаляется,
+# когда у всех его сессий есть более свежий снимок. Восстановление:
+# последний снимок плюс команды сессии из журнала с номерами после него.
+import argparse
+import glob
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+
+from .main import process_command
+from .output import NullSink
+from .session import dump_state, load_state
+
+JOURNAL_ENTRY = struct.Struct('<IIQB')
+SNAPSHOT_HEADER = struct.Struct('<8sQ')
+SNAPSHOT_MAGIC = b'LABSNAP2'
+
+# Коды сессий: uuid4().hex[:12]
+SESSION_ID_RE = re.compile(r'[0-9a-f]{12}')
+
+# Размер сегмента журнала, после которого начинается следующий
+SEGMENT_SIZE = 16 * 1024 * 1024
+
+
+def is_session_id(session_id):
+    """Годится ли строка в коды сессий (и в имена файлов снимков)"""
+    return SESSION_ID_RE.fullmatch(session_id) is not None
+
+
+def encode_snapshot(game_state):
+    """
+    Компактный снимок сериализуемой части состояния: JSON, сжатый zlib
+
+    Не pickle: снимок читается по коду сессии, который присылает клиент.
+    """
+    data = json.dumps(dump_state(game_state), ensure_ascii=False,
+                      separators=(',', ':')).encode()
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, game_state.journal_seq)
+    return header + zlib.compress(data, 1)
+
+
+def decode_snapshot(data):
+    magic, _ = SNAPSHOT_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("Поврежденный снимок сессии")
+    return load_state(json.loads(zlib.decompress(data[SNAPSHOT_HEADER.size:])))
+
+
+def encode_entry(session_id, seq, user_input):
+    key = session_id.encode()
+    payload = key + user_input.encode()
+    return JOURNAL_ENTRY.pack(len(payload) - len(key), zlib.crc32(payload),
+                              seq, len(key)) + payload
+
+
+def read_journal(path):
+    """
+    Читает записи сегмента журнала (код сессии, номер, команда)
+
+    Недописанная или поврежденная запись в конце (сбой во время записи)
+    и все после нее пропускаются.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    position = 0
+    while position + JOURNAL_ENTRY.size <= len(data):
+        length, checksum, seq, key_length = JOURNAL_ENTRY.unpack_from(
+            data, position)
+        start = position + JOURNAL_ENTRY.size
+        end = start + key_length + length
+        payload = data[start:end]
+        if len(payload) < key_length + length or zlib.crc32(payload) != checksum:
+            return
+        yield (payload[:key_length].decode(), seq,
+               payload[key_length:].decode())
+        position = end
+
+
+class SessionStore:
+    """
+    Каталог с журналом и снимками сессий
+
+    record() только кладет запись в буфер; commit() сбрасывает буфер на
+    диск. Сервер вызывает commit() из отдельного потока каждые несколько
+    миллисекунд, так что fsync не задерживает команды.
+
+    read_only=True открывает каталог только для чтения (load, exists): не
+    создает каталог и новый сегмент журнала и не удаляет старые, поэтому
+    так можно смотреть сессии работающего сервера.
+    """
+
+    def __init__(self, directory, snapshot_every=200, read_only=False):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.read_only = read_only
+        self.pending = []
+        self.lock = threading.Lock()
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+
+        # {номер сегмента: {сессия: номер ее последней команды в нем}} для
+        # команд, еще не вошедших в снимки
+        self.live = {}
+        self.segment = 0
+        for path in self.segments():
+            self.segment = self._number(path)
+            self.live[self.segment] = self._live_sessions(path)
+        if read_only:
+            self.journal = None
+            return
+        self.segment += 1
+        self.journal = open(self._segment_path(self.segment), 'ab')
+        self._drop_segments()
+
+    def _path(self, session_id, suffix):
+        if not is_session_id(session_id):
+            raise ValueError(f"Недопустимый код сессии: {session_id!r}")
+        return os.path.join(self.directory, f"{session_id}.{suffix}")
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f"journal-{number:08d}.log")
+
+    @staticmethod
+    def _number(path):
+        return int(os.path.basename(path)[len('journal-'):-len('.log')])
+
+    def segments(self):
+        """Пути сегментов журнала по порядку"""
+        return sorted(glob.glob(os.path.join(self.directory, 'journal-*.log')))
+
+    def snapshot_seq(self, session_id):
+        """Номер последней команды в снимке сессии (-1, если снимка нет)"""
+        try:
+            with open(self._path(session_id, 'snapshot'), 'rb') as f:
+                return SNAPSHOT_HEADER.unpack(f.read(SNAPSHOT_HEADER.size))[1]
+        except (FileNotFoundError, struct.error):
+            return -1
+
+    def _live_sessions(self, path):
+        """Сессии сегмента с командами новее их снимков (после перезапуска)"""
+        last = {}
+        for session_id, seq, _ in read_journal(path):
+            last[session_id] = seq
+        return {session_id: seq for session_id, seq in last.items()
+                if seq > self.snapshot_seq(session_id)}
+
+    def start(self, session_id, game_state):
+        """
+        Делает сессию сохраняемой: возвращает ее начальный снимок
+
+        Снимок нужно записать (write_snapshot) до первой команды.
+        """
+        game_state.journal_seq = 0
+        return encode_snapshot(game_state)
+
+    def record(self, session_id, game_state, user_input):
+        """
+        Заносит выполненную команду в журнал (в буфер)
+
+        Returns:
+            bool: Пора ли сделать снимок состояния
+        """
+        self._check_writable()
+        game_state.journal_seq += 1
+        seq = game_state.journal_seq
+        entry = encode_entry(session_id, seq, user_input)
+        with self.lock:
+            self.pending.append((session_id, seq, entry))
+        return seq % self.snapshot_every == 0
+
+    def commit(self):
+        """Group commit: дописывает буфер всех сессий одним fsync"""
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if not pending:
+            return 0
+        self.journal.write(b''.join(entry for _, _, entry in pending))
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        sessions = self.live.setdefault(self.segment, {})
+        for session_id, seq, _ in pending:
+            sessions[session_id] = seq
+
+        if self.journal.tell() >= SEGMENT_SIZE:
+            self.journal.close()
+            self.segment += 1
+            self.journal = open(self._segment_path(self.segment), 'ab')
+            self._drop_segments()
+        return len(pending)
+
+    def write_snapshot(self, session_id, snapshot):
+        """
+        Атомарно записывает снимок сессии
+
+        snapshot получают заранее через encode_snapshot, чтобы состояние
+        сериализовалось в момент вызова, а запись шла в фоне.
+        """
+        self._check_writable()
+        self.commit()
+        path = self._path(session_id, 'snapshot')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+        # Команды сессии до снимка больше не нужны
+        seq = SNAPSHOT_HEADER.unpack_from(snapshot)[1]
+        for sessions in self.live.values():
+            if sessions.get(session_id, seq + 1) <= seq:
+                del sessions[session_id]
+        self._drop_segments()
+
+    def _check_writable(self):
+        if self.read_only:
+            raise ValueError(f"{self.directory}: открыт только для чтения")
+
+    def _drop_segments(self):
+        """Удаляет закрытые сегменты, все команды которых вошли в снимки"""
+        for number, sessions in list(self.live.items()):
+            if number != self.segment and not sessions:
+                os.remove(self._segment_path(number))
+                del self.live[number]
+
+    def close(self):
+        if self.journal is None:
+            return
+        self.commit()
+        self.journal.close()
+
+    def exists(self, session_id):
+        return (is_session_id(session_id)
+                and os.path.exists(self._path(session_id, 'snapshot')))
+
+    def load(self, session_id):
+        """
+        Восстанавливает состояние: последний снимок + хвост журнала
+
+        Первый снимок пишется до первой команды сессии (см. start), так
+        что у любой сохраненной сессии он есть.
+
+        Returns:
+            dict | None: Состояние сессии или None, если ее нет
+        """
+        if not is_session_id(session_id):
+            return None
+        try:
+            with open(self._path(session_id, 'snapshot'), 'rb') as f:
+                game_state = decode_snapshot(f.read())
+        except FileNotFoundError:
+            return None
+
+        # Повторяем команды после снимка без вывода
+        if not self.read_only:
+            self.commit()
+        game_state.output = NullSink()
+        for number, sessions in sorted(self.live.items()):
+            if session_id not in sessions:
+                continue
+            for key, seq, user_input in read_journal(self._segment_path(number)):
+                if key != session_id or seq <= game_state.journal_seq:
+                    continue
+                process_command(game_state, user_input)
+                game_state.journal_seq = seq
+        game_state.output = None
+        return game_state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Восстановление сохраненной сессии Лабиринта")
+    parser.add_argument('directory',
+                        help="каталог с журналом и снимками (только чтение)")
+    parser.add_argument('session', help="код сессии")
+    args = parser.parse_args(argv)
+
+    store = SessionStore(args.directory, read_only=True)
+    game_state = store.load(args.session)
+    store.close()
+    if game_state is None:
+        parser.error(f"сессия {args.session} не найдена")
+    print(json.dumps(dump_state(game_state), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
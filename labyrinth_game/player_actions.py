@@ -1,20 +1,16 @@
 # Действия игрока
-from .constants import ROOMS
-from .utils import random_event
+from .events import emit
+from .items import session_rules
+from .routing import get_route_index, held_keys
+from .utils import describe_current_room, random_event
+from .world import get_room, get_world, remove_room_item
 
 
 def show_inventory(game_state):
     """
     Отображает содержимое инвентаря игрока
     """
-    inventory = game_state.get('player_inventory', [])
-
-    if not inventory:
-        print("\nВаш инвентарь пуст.")
-    else:
-        print("\n Ваш инвентарь:")
-        for i, item in enumerate(inventory, 1):
-            print(f"  {i}. {item}")
+    emit(game_state, 'inventory', tuple(game_state.player_inventory))
 
 
 def get_input(prompt="> "):
@@ -36,35 +32,33 @@ def move_player(game_state, direction):
     """
     Перемещает игрока в указанном направлении
     """
-    current_room = game_state['current_room']
-    room_data = ROOMS.get(current_room, {})
+    current_room = game_state.current_room
+    room_data = get_room(game_state, current_room)
     exits = room_data.get('exits', {})
 
     # Проверяем, существует ли выход в этом направлении
     if direction in exits:
         next_room = exits[direction]
         
-        # Проверяем доступ к treasure_room
-        if next_room == 'treasure_room':
-            inventory = game_state.get('player_inventory', [])
-            if 'rusty_key' not in inventory:
-                print("Дверь заперта. Нужен ключ, чтобы пройти дальше.")
+        # Проверяем, не требует ли дверь предмета (DOOR_REQUIREMENTS)
+        required = session_rules(game_state).doors.get(next_room)
+        if required:
+            if required not in game_state.player_inventory:
+                emit(game_state, 'door_locked', next_room, required)
                 return False
-            else:
-                print(
-                """
-                Вы используете найденный ключ,
-                чтобы открыть путь в комнату сокровищ.
-                """)
+            emit(game_state, 'door_opened', next_room, required)
         
         # Обновляем текущую комнату
-        game_state['current_room'] = next_room
+        game_state.current_room = next_room
+        visited = game_state.visited_rooms
+        if next_room not in visited:
+            visited.append(next_room)
         
         # Увеличиваем шаг на единицу
-        game_state['steps_taken'] = game_state.get('steps_taken', 0) + 1
+        game_state.steps_taken += 1
+        emit(game_state, 'moved', direction, next_room)
         
         # Выводим описание новой комнаты
-        from .utils import describe_current_room
         describe_current_room(game_state)
         
         # Вызываем случайное событие
@@ -72,40 +66,66 @@ def move_player(game_state, direction):
         
         return True
     else:
-        # Выводим сообщение, если выхода нет
-        print("Нельзя пойти в этом направлении.")
+        # Сообщаем, что выхода нет
+        emit(game_state, 'no_exit', direction)
         return False
 
 
+def goto_room(game_state, room_name):
+    """
+    Ведет игрока в указанную комнату по кратчайшему пути
+    """
+    world = get_world(game_state)
+    if room_name not in world:
+        emit(game_state, 'unknown_room', room_name)
+        return False
+    if game_state.current_room == room_name:
+        emit(game_state, 'already_here', room_name)
+        return True
+    
+    routes = get_route_index(world)
+    while game_state.current_room != room_name:
+        direction = routes.next_step(game_state.current_room, room_name,
+                                     held_keys(game_state))
+        if direction is None:
+            emit(game_state, 'no_route', room_name)
+            return False
+        
+        # Идем по шагу: по дороге могут случиться события и ловушки
+        if not move_player(game_state, direction):
+            return False
+        if game_state.game_over or game_state.pending_prompt:
+            return False
+    return True
+
+
 def take_item(game_state, item_name):
     """
     Берет предмет из комнаты и добавляет в инвентарь
     """
-    current_room = game_state['current_room']
-    room_data = ROOMS.get(current_room, {})
-    items = room_data.get('items', [])
+    current_room = game_state.current_room
+    room_data = get_room(game_state, current_room)
+    items = room_data.get('items', ())
     
     # Проверяем, есть ли предмет в комнате
     if item_name in items:
         # Проверяем, не пытается ли игрок взять сундук
         if item_name == 'treasure_chest':
-            print("Вы не можете поднять сундук, он слишком тяжелый.")
+            emit(game_state, 'item_too_heavy', item_name)
             return False
             
         # Добавляем предмет в инвентарь игрока
-        if 'player_inventory' not in game_state:
-            game_state['player_inventory'] = []
-        game_state['player_inventory'].append(item_name)
+        game_state.player_inventory.append(item_name)
         
         # Удаляем предмет из списка предметов комнаты
-        items.remove(item_name)
+        remove_room_item(game_state, current_room, item_name)
         
-        # Печатаем сообщение о взятии предмета
-        print(f"Вы подняли: {item_name}")
+        # Сообщаем о взятии предмета
+        emit(game_state, 'item_taken', item_name)
         return True
     else:
-        # Выводим сообщение, если предмета нет
-        print("Такого предмета здесь нет.")
+        # Сообщаем, что предмета нет
+        emit(game_state, 'item_missing', item_name)
         return False
 
 
@@ -113,58 +133,27 @@ def use_item(game_state, item_name):
     """
     Использует предмет из инвентаря
     """
-    inventory = game_state.get('player_inventory', [])
+    inventory = game_state.player_inventory
     
     # Проверяем, есть ли предмет в инвентаре
     if item_name not in inventory:
-        print("У вас нет такого предмета.")
+        emit(game_state, 'item_not_held', item_name)
         return False
     
-    # Выполняем уникальное действие для каждого предмета
-    match item_name:
-        case 'torch':
-            print(" Вы зажгли факел. Стало светлее.")
-        
-        case 'sword':
-            print(" Вы почувствовали уверенность, держа меч в руках.")
-        
-        case 'bronze_box':
-            print(" Вы открыли бронзовую шкатулку.")
-            if 'rusty_key' not in inventory:
-                game_state['player_inventory'].append('rusty_key')
-                print("Внутри вы нашли ржавый ключ!")
-            else:
-                print("Шкатулка пуста.")
-        
-        case 'rusty_key':
-            print(" Ржавый ключ. Возможно, он подойдет к какой-то двери.")
-        
-        case 'ancient_book':
-            print(" Вы пролистали древнюю книгу, "
-                  "но не смогли разобрать письмена.")
-        
-        case 'blue_crystal':
-            print(" Кристалл мягко светится в ваших руках.")
-        
-        case 'silver_mirror':
-            print(" В зеркале вы видите свое отражение.")
-        
-        case 'glowing_flower':
-            print(" Цветок излучает мягкий свет.")
-        
-        case 'ancient_scroll':
-            print(" Свиток покрыт древними символами, "
-                  "которые вы не можете прочитать.")
-        
-        case _:
-            print(f"Вы не знаете, как использовать {item_name}.")
+    # Действие предмета - из таблицы правил (ITEM_EFFECTS)
+    effect = session_rules(game_state).effects.get(item_name)
+    if effect is None:
+        emit(game_state, 'item_unusable', item_name)
+        return True
+    emit(game_state, 'item_used', item_name, effect[0])
     
-    return True
-
-
-def solve_puzzle(game_state):
-    """
-    Решает загадку в текущей комнате
-    """
-    from .utils import solve_puzzle as utils_solve_puzzle
-    return utils_solve_puzzle(game_state)
\ No newline at end of file
+    # Предмет может дать другой предмет (шкатулка - ключ), один раз
+    gives = effect[1]
+    if gives:
+        if gives not in inventory:
+            inventory.append(gives)
+            emit(game_state, 'item_gained', gives, item_name, effect[2])
+        else:
+            emit(game_state, 'item_empty', item_name, effect[3])
+    
+    return True
\ No newline at end of file
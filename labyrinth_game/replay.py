@@ -0,0 +1,340 @@
+# Прогон записей asciicast v2 (как rec_file) через игру и сверка вывода
+#
+# Запись читается потоком, по строке-событию за раз. Из эха терминала
+# восстанавливаются набранные строки (с учетом стирания), каждая строка
+# выполняется через process_command, а вывод игры сравнивается с тем,
+# что было в записи до следующего приглашения.
+import argparse
+import difflib
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+
+from .constants import PROMPTS
+from .main import process_command, show_intro
+from .output import MemorySink, flush_output
+from .session import new_game_state
+from .utils import get_prompt
+
+# С этой строки начинается вывод игры (см. show_intro)
+INTRO_MARK = "Добро пожаловать в Лабиринт сокровищ!"
+
+# bash включает bracketed paste перед каждым своим приглашением: значит,
+# игра завершилась и терминал снова у оболочки
+SHELL_MARK = '\x1b[?2004h'
+
+# Приглашения игры так, как они видны в конце вывода
+PROMPT_ENDINGS = tuple(prompt.lstrip('\n') for prompt in PROMPTS.values())
+
+# Управляющие последовательности терминала: CSI, OSC и двухсимвольные
+ANSI_RE = re.compile(r'\x1b(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)'
+                     r'|[@-Z\\-_])')
+
+# Сколько расхождений хранить для отчета (считаются все)
+MAX_REPORTED = 20
+
+# Команды, появившиеся в игре после записи rec_file: их строки справки
+# игра печатает, а в записи их нет (см. allowed_new_lines, --strict)
+COMMANDS_SINCE_RECORDING = ('goto <room>', 'map')
+
+# Разбор строки JSON без обертки json.loads (строк в записи сотни тысяч)
+_decode = json.JSONDecoder().raw_decode
+
+
+def read_events(lines):
+    """
+    События записи asciicast v2 по одному: (время, тип, данные)
+
+    Args:
+        lines: Итерируемые строки записи (файл читается потоком)
+    """
+    lines = iter(lines)
+    header = json.loads(next(lines))
+    if header.get('version') != 2:
+        raise ValueError(f"Неподдерживаемая версия asciicast: "
+                         f"{header.get('version')}")
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            event = _decode(line)[0]
+        except ValueError:
+            # Недописанная последняя строка: запись еще идет или оборвалась
+            if line.endswith('\n'):
+                raise
+            return
+        yield event
+
+
+class LineEditor:
+    """
+    Строка, набираемая в терминале, по эху набора
+
+    erase='byte' (по умолчанию) стирает последний байт UTF-8, как
+    канонический режим терминала без IUTF8 (так записан rec_file: стирание
+    русской буквы оставляло в строке ее половину), erase='char' - последний
+    символ.
+    """
+
+    def __init__(self, erase='byte'):
+        self.erase = erase
+        self.buffer = bytearray() if erase == 'byte' else []
+
+    def type(self, text):
+        if self.erase == 'byte':
+            self.buffer += text.encode()
+        else:
+            self.buffer.extend(text)
+
+    def backspace(self):
+        del self.buffer[-1:]
+
+    def submit(self):
+        """Набранная строка (как ее вернет get_input); буфер очищается"""
+        if self.erase == 'byte':
+            line = self.buffer.decode('utf-8', 'replace')
+        else:
+            line = ''.join(self.buffer)
+        self.buffer.clear()
+        return line.strip()
+
+
+def read_exchanges(events, erase='byte'):
+    """
+    Обмены с игрой из потока событий записи
+
+    Yields:
+        tuple: (номер сессии, строка ввода, ожидаемый вывод). Для начала
+            сессии строка равна None, вывод - приветствие. Вывод включает
+            следующее приглашение, если игра его выдала.
+    """
+    session = 0
+    state = 'shell'
+    seen = ''  # хвост вывода оболочки: метка могла разорваться между кадрами
+    output = []
+    line = None
+    editor = LineEditor(erase)
+
+    for _, kind, data in events:
+        if kind != 'o':
+            continue
+        while data:
+            if state == 'shell':
+                seen = seen[-len(INTRO_MARK):] + ANSI_RE.sub('', data)
+                data = ''
+                start = seen.find(INTRO_MARK)
+                if start >= 0:
+                    # Остаток кадра (приветствие) разбирается как вывод игры
+                    session += 1
+                    state, line, output = 'output', None, []
+                    data, seen = seen[start:], ''
+                continue
+
+            end = data.find(SHELL_MARK)
+            if end >= 0:
+                # Игра завершилась; остаток кадра - снова оболочка
+                if state == 'output':
+                    output.append(ANSI_RE.sub('', data[:end]))
+                    yield session, line, ''.join(output).replace('\r\n', '\n')
+                state, data = 'shell', data[end:]
+                continue
+
+            if state == 'output':
+                output.append(ANSI_RE.sub('', data))
+                data = ''
+                text = ''.join(output).replace('\r\n', '\n')
+                if text.endswith(PROMPT_ENDINGS):
+                    yield session, line, text
+                    state, output = 'typing', []
+                continue
+
+            # state == 'typing': эхо набора до Enter. Чаще всего кадр -
+            # одна нажатая клавиша
+            if len(data) == 1 and data.isprintable():
+                editor.type(data)
+                break
+            text = ANSI_RE.sub('', data).replace('\b \b', '\b')
+            data = ''
+            for i, char in enumerate(text):
+                if char == '\b' or char == '\x7f':
+                    editor.backspace()
+                elif char in '\r\n':
+                    line = editor.submit()
+                    rest = text[i + 1:]
+                    if char == '\r' and rest.startswith('\n'):
+                        rest = rest[1:]
+                    state, data = 'output', rest
+                    output = []
+                    break
+                elif char.isprintable():
+                    editor.type(char)
+
+    if state == 'output' and output:
+        yield session, line, ''.join(output).replace('\r\n', '\n')
+
+
+class _DropSymbols(dict):
+    """
+    Таблица для str.translate: убирает эмодзи и прочие символы-значки.
+    Категория символа считается один раз, дальше translate берет ее из
+    словаря без вызовов Python.
+    """
+
+    def __missing__(self, code):
+        drop = unicodedata.category(chr(code)) in ('So', 'Sk', 'Cf', 'Mn')
+        self[code] = value = None if drop else code
+        return value
+
+
+DROP_SYMBOLS = _DropSymbols()
+
+
+def allowed_new_lines(commands=COMMANDS_SINCE_RECORDING):
+    """
+    Строки вывода, которых может не быть в записи: справка по командам,
+    добавленным после нее (в том виде, в каком их сравнивает replay)
+    """
+    # Импорт здесь: HELP_TEXT живет в utils вместе с командой help
+    from .utils import HELP_TEXT
+    prefixes = tuple(f"{command} " for command in commands)
+    return frozenset(line for line in normalize_output(HELP_TEXT)
+                     if line.startswith(prefixes))
+
+
+@lru_cache(maxsize=4096)
+def normalize_output(text):
+    """
+    Строки вывода для сравнения: без управляющих последовательностей,
+    эмодзи, отступов и пустых строк (в старых версиях игры сообщения
+    начинались с эмодзи)
+    """
+    text = ANSI_RE.sub('', text).replace('\r\n', '\n').translate(DROP_SYMBOLS)
+    return tuple(line.strip() for line in text.split('\n') if line.strip())
+
+
+def replay_exchanges(exchanges, seed=None, world_path=None,
+                     max_reported=MAX_REPORTED, allowed=frozenset()):
+    """
+    Выполняет обмены из записи и сверяет вывод
+
+    Args:
+        allowed: Строки вывода игры, которых может не быть в записи
+            (см. allowed_new_lines); они не считаются расхождением
+
+    Returns:
+        dict: sessions, commands, mismatches (число) и reported - первые
+            расхождения (сессия, номер команды, строка, ожидалось, получено)
+    """
+    stats = {'sessions': 0, 'commands': 0, 'mismatches': 0, 'reported': []}
+    game_state = sink = None
+    index = 0
+
+    for session, line, expected in exchanges:
+        if line is None:
+            # Новая сессия: свежее состояние и приветствие
+            game_state = new_game_state(seed, world_path)
+            sink = game_state.output = MemorySink()
+            stats['sessions'] += 1
+            index = 0
+            show_intro(game_state)
+        elif not game_state.game_over:
+            stats['commands'] += 1
+            index += 1
+            # Как в play: пустая строка вне вопроса ничего не делает
+            if line or game_state.pending_prompt:
+                process_command(game_state, line)
+
+        flush_output(game_state)
+        actual = sink.take()
+        if not game_state.game_over:
+            actual += get_prompt(game_state)
+
+        if expected == actual:
+            continue
+        expected_lines = normalize_output(expected)
+        actual_lines = normalize_output(actual)
+        if allowed and expected_lines != actual_lines:
+            actual_lines = tuple(line for line in actual_lines
+                                 if line not in allowed or line in expected_lines)
+        if expected_lines != actual_lines:
+            stats['mismatches'] += 1
+            if len(stats['reported']) < max_reported:
+                stats['reported'].append(
+                    (session, index, line, expected_lines, actual_lines))
+    return stats
+
+
+def replay_file(path, erase='byte', seed=None, world_path=None,
+                max_reported=MAX_REPORTED, strict=False):
+    """
+    Прогоняет одну запись; возвращает (путь, статистика)
+
+    strict=True сравнивает без allowed_new_lines: справка по командам,
+    добавленным после записи, тоже считается расхождением.
+    """
+    allowed = frozenset() if strict else allowed_new_lines()
+    with open(path, encoding='utf-8') as f:
+        exchanges = read_exchanges(read_events(f), erase)
+        return path, replay_exchanges(exchanges, seed, world_path, max_reported,
+                                      allowed)
+
+
+def print_mismatch(path, session, index, line, expected, actual):
+    where = "приветствие" if line is None else f"команда {index} {line!r}"
+    print(f"{path}: сессия {session}, {where}")
+    for diff_line in difflib.unified_diff(expected, actual, 'запись', 'игра',
+                                          lineterm='', n=1):
+        print(f"    {diff_line}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Прогон записей asciicast через игру со сверкой вывода")
+    parser.add_argument('recordings', nargs='+', help="файлы asciicast v2")
+    parser.add_argument('--erase', choices=('char', 'byte'), default='byte',
+                        help="что стирает Backspace в записи: символ или "
+                             "байт UTF-8 (терминал без IUTF8)")
+    parser.add_argument('--seed', type=int,
+                        help="зерно случайных событий (по умолчанию без зерна)")
+    parser.add_argument('--world', help="файл мира (по умолчанию встроенный)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help="число параллельных процессов")
+    parser.add_argument('--show', type=int, default=MAX_REPORTED,
+                        help="сколько расхождений показать на запись")
+    parser.add_argument('--strict', action='store_true',
+                        help="считать расхождением и справку по командам, "
+                             "добавленным после записи (goto, map)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    run = partial(replay_file, erase=args.erase, seed=args.seed,
+                  world_path=args.world, max_reported=args.show,
+                  strict=args.strict)
+    if len(args.recordings) > 1 and args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(run, args.recordings))
+    else:
+        results = [run(path) for path in args.recordings]
+    elapsed = time.perf_counter() - started
+
+    totals = {'sessions': 0, 'commands': 0, 'mismatches': 0}
+    for path, stats in results:
+        for key in totals:
+            totals[key] += stats[key]
+        for mismatch in stats['reported']:
+            print_mismatch(path, *mismatch)
+    print(f"Записей: {len(results)}, сессий: {totals['sessions']}, "
+          f"команд: {totals['commands']}, расхождений: {totals['mismatches']}, "
+          f"время: {elapsed:.2f} с ({totals['commands'] / elapsed:.0f} команд/с)",
+          file=sys.stderr)
+    if totals['mismatches']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
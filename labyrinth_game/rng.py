@@ -0,0 +1,116 @@
+# Псевдослучайные числа: потоки сессий с зерном и пакетный расчет
+import math
+
+# NumPy необязателен (extra 'fast'), а его импорт дольше запуска всей игры,
+# поэтому он загружается при первом пакетном расчете (_numpy). Сессии без
+# зерна пакетов не считают и NumPy не загружают. Серверы и симуляции
+# загружают его заранее (warm_up), чтобы первый ход не ждал импорта.
+_np = None
+
+# Шаг, на который зерно сессии сдвигает последовательность синуса
+SEED_STRIDE = 1_000_003
+
+# Сколько значений потока рассчитывается за один пакет
+BATCH_SIZE = 256
+
+
+def pseudo_random(seed, modulo):
+    """
+    Генерирует псевдослучайное число на основе синуса
+
+    Args:
+        seed (int): Начальное значение
+        modulo (int): Модуль для диапазона результата
+
+    Returns:
+        int: Псевдослучайное число в диапазоне [0, modulo]
+    """
+    x = math.sin(seed * 12.9898) * 43758.5453
+    fractional = x - math.floor(x)
+    result = fractional * modulo
+    return int(result)
+
+
+def _numpy():
+    """Модуль numpy или False, если он не установлен"""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:  # без NumPy расчет идет на Python
+            _np = False
+    return _np
+
+
+def warm_up():
+    """
+    Загружает NumPy до первого пакетного расчета: в сервере импорт внутри
+    первого хода останавливал бы цикл событий для всех сессий
+    """
+    _numpy()
+
+
+def fractions(start, count):
+    """
+    Дробные части синуса для индексов start..start+count-1 одним вызовом
+
+    Returns:
+        list[float]: Значения из [0, 1); умножение на модуль дает
+        то же, что pseudo_random
+    """
+    np = _numpy()
+    if np:
+        x = np.sin(np.arange(start, start + count, dtype=np.float64)
+                   * 12.9898) * 43758.5453
+        return (x - np.floor(x)).tolist()
+    values = []
+    for n in range(start, start + count):
+        x = math.sin(n * 12.9898) * 43758.5453
+        values.append(x - math.floor(x))
+    return values
+
+
+def seeded_fractions(seed, start, count):
+    """Пакет значений потока с зерном seed, начиная с шага start"""
+    return fractions(start + seed * SEED_STRIDE, count)
+
+
+def prime_stream(game_state, count):
+    """
+    Заранее рассчитывает count значений потока сессии от текущего шага
+
+    Используется симуляциями: все броски событий и ловушек на весь
+    прогон считаются одним векторным вызовом.
+    """
+    seed = game_state.rng_seed
+    if seed is None:
+        return
+    start = game_state.steps_taken
+    game_state.rng = {
+        'start': start,
+        'values': seeded_fractions(seed, start, count)
+    }
+
+
+def draw(game_state, offset, modulo):
+    """
+    Псевдослучайное число в [0, modulo) для текущего шага сессии
+
+    Без зерна (rng_seed is None) результат совпадает с прежним
+    pseudo_random(steps_taken + offset, modulo). С зерном значения
+    берутся из потока сессии, который пересчитывается пакетами.
+    """
+    index = game_state.steps_taken + offset
+    seed = game_state.rng_seed
+    if seed is None:
+        return pseudo_random(index, modulo)
+
+    stream = game_state.rng
+    if (stream is None or index < stream['start']
+            or index >= stream['start'] + len(stream['values'])):
+        stream = game_state.rng = {
+            'start': index,
+            'values': seeded_fractions(seed, index, BATCH_SIZE)
+        }
+    return int(stream['values'][index - stream['start']] * modulo)
@@ -0,0 +1,432 @@
+# Маршрутизатор сессий: игроки распределяются по процессам-обработчикам
+#
+# Один процесс Python упирается в одно ядро, как только process_command
+# становится основной нагрузкой. Роутер принимает подключения, а сами
+# сессии (game_state и изменения мира) живут в процессах-обработчиках.
+# Роутер и обработчик обмениваются кадрами: заголовок FRAME_HEADER и
+# текст в UTF-8.
+import argparse
+import asyncio
+import contextlib
+import multiprocessing
+import random
+import signal
+import socket
+import struct
+import sys
+import time
+import zlib
+
+from .main import run_commands, show_intro, split_commands
+from .output import MemorySink, flush_output, say
+from .rng import warm_up
+from .server import ServerStats, read_batch, report_stats
+from .session import new_game_state
+from .utils import get_prompt
+
+# Кадр: тип (1 байт), номер сессии (8 байт), длина данных (4 байта)
+FRAME_HEADER = struct.Struct('<BQI')
+
+# Типы кадров. Роутер -> обработчик: OPEN (новая сессия), INPUT (строка
+# игрока), CLOSE (игрок отключился). Обработчик -> роутер: OUTPUT (вывод
+# и приглашение), END (последний вывод, игра окончена), LOAD (нагрузка)
+OPEN, INPUT, CLOSE, OUTPUT, END, LOAD = range(1, 7)
+
+# Данные кадра LOAD: сессий, команд всего, секунд работы всего
+LOAD_PAYLOAD = struct.Struct('<IQd')
+
+# Начало данных кадров OUTPUT и END: сколько команд пакета выполнено,
+# дальше - текст
+REPLY_COUNT = struct.Struct('<I')
+
+# Как часто обработчик сообщает о нагрузке, секунды
+LOAD_INTERVAL = 1.0
+
+# Пауза перед перезапуском упавшего обработчика, секунды
+RESTART_DELAY = 0.5
+
+# Сколько байт ответов обработчик копит в буфере, прежде чем ждать роутер
+HIGH_WATER = 1 << 20
+
+# Последний вывод сессии, команда которой упала в обработчике
+SESSION_ERROR_TEXT = "\nВнутренняя ошибка сервера, сессия завершена.\n"
+
+
+def encode_frame(kind, session, payload=b''):
+    return FRAME_HEADER.pack(kind, session, len(payload)) + payload
+
+
+async def read_frame(reader):
+    """Следующий кадр: (тип, номер сессии, данные)"""
+    header = await reader.readexactly(FRAME_HEADER.size)
+    kind, session, size = FRAME_HEADER.unpack(header)
+    payload = await reader.readexactly(size) if size else b''
+    return kind, session, payload
+
+
+def rendezvous_weight(session, index):
+    """Вес пары сессия-обработчик для рандеву-хеширования"""
+    return zlib.crc32(struct.pack('<QI', session, index))
+
+
+class WorkerLost(Exception):
+    """Процесс-обработчик завершился, его сессии потеряны"""
+
+
+async def join_process(process, timeout):
+    """Ждет завершения процесса, не останавливая цикл событий"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, process.join, timeout)
+    if process.exitcode is None:
+        process.kill()
+        await loop.run_in_executor(None, process.join)
+
+
+# Обработчик
+
+def worker_main(sock, seeded=True, world_path=None):
+    """Точка входа процесса-обработчика"""
+    # Ctrl+C останавливает роутер, а он - обработчиков
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if seeded:
+        warm_up()
+    asyncio.run(serve_worker(sock, seeded, world_path))
+
+
+async def serve_worker(sock, seeded=True, world_path=None,
+                       load_interval=LOAD_INTERVAL):
+    """
+    Выполняет команды сессий, пришедшие от роутера, до закрытия канала
+    """
+    reader, writer = await asyncio.open_connection(sock=sock)
+    sessions = {}
+    # Команд выполнено и секунд потрачено с запуска обработчика
+    load = [0, 0.0]
+
+    async def send(frame):
+        # Все кадры, включая LOAD, ждут роутер при переполнении буфера
+        writer.write(frame)
+        if writer.transport.get_write_buffer_size() > HIGH_WATER:
+            await writer.drain()
+
+    async def report_load():
+        while True:
+            await asyncio.sleep(load_interval)
+            await send(encode_frame(LOAD, 0, LOAD_PAYLOAD.pack(
+                len(sessions), load[0], load[1])))
+
+    reporter = asyncio.create_task(report_load())
+    try:
+        while True:
+            try:
+                kind, session, payload = await read_frame(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            if kind not in (OPEN, INPUT) or (kind == INPUT
+                                             and session not in sessions):
+                # CLOSE или строка для уже закрытой сессии
+                sessions.pop(session, None)
+                continue
+
+            started = time.perf_counter()
+            executed = 0
+            try:
+                if kind == OPEN:
+                    seed = random.getrandbits(31) if seeded else None
+                    game_state = sessions[session] = new_game_state(
+                        seed, world_path)
+                    game_state.output = MemorySink()
+                    show_intro(game_state)
+                else:
+                    game_state = sessions[session]
+                    # Пакет строк от клиента выполняется целиком
+                    # (см. run_commands)
+                    executed = run_commands(
+                        game_state,
+                        split_commands(payload.decode(errors='replace')))
+                    load[0] += executed
+
+                reply = OUTPUT
+                if game_state.game_over:
+                    reply = END
+                    del sessions[session]
+                else:
+                    say(game_state, get_prompt(game_state), end='')
+                flush_output(game_state)
+                output = game_state.output.take()
+            except Exception as error:
+                # Ошибка в одной сессии не должна останавливать остальные
+                # сессии обработчика: эта сессия завершается
+                print(f"Ошибка в сессии {session}: {error!r}", file=sys.stderr)
+                sessions.pop(session, None)
+                reply, output = END, SESSION_ERROR_TEXT
+            load[1] += time.perf_counter() - started
+            await send(encode_frame(reply, session, REPLY_COUNT.pack(executed)
+                                    + output.encode()))
+    finally:
+        reporter.cancel()
+        writer.close()
+
+
+# Роутер
+
+class Worker:
+    """Процесс-обработчик глазами роутера"""
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.writer = None
+        self.alive = False
+        # Номер запуска процесса: сессии прежнего запуска потеряны
+        self.generation = 0
+        # {номер сессии: Future ответа на последний кадр}
+        self.pending = {}
+        # Сессии и задержки команд этого обработчика (как у всего сервера)
+        self.stats = ServerStats()
+        self.restarts = 0
+        # Последний LOAD и значение занятости на момент прошлой сводки
+        self.load = (0, 0, 0.0)
+        self.last_busy = (0.0, time.perf_counter())
+
+    def request(self, generation, kind, session, payload=b''):
+        """
+        Отправляет кадр и возвращает Future ответа (тип, выполнено команд,
+        текст)
+
+        generation - номер запуска, в котором сессия открыта: после
+        перезапуска обработчик о ней не знает.
+        """
+        if not self.alive or generation != self.generation:
+            raise WorkerLost(self.index)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[session] = future
+        self.writer.write(encode_frame(kind, session, payload))
+        return future
+
+    def busy_share(self):
+        """Доля времени, которую обработчик считал команды с прошлого вызова"""
+        busy, now = self.load[2], time.perf_counter()
+        last_busy, last_time = self.last_busy
+        self.last_busy = (busy, now)
+        return max(0.0, busy - last_busy) / max(now - last_time, 1e-9)
+
+    def summary(self):
+        pid = self.process.pid if self.process else '-'
+        state = "" if self.alive else ", остановлен"
+        stats = self.stats
+        p50, p99 = stats.percentile(50) * 1000, stats.percentile(99) * 1000
+        return (f"  обработчик {self.index} (pid {pid}{state}): "
+                f"сессий {stats.active_sessions}, команд {stats.commands}, "
+                f"занят {self.busy_share():.0%}, p50={p50:.3f} мс, "
+                f"p99={p99:.3f} мс, перезапусков {self.restarts}")
+
+
+class Router:
+    """
+    Распределяет сессии по обработчикам и пересылает им строки игроков
+
+    Сессия закрепляется за обработчиком при подключении: из двух первых
+    по рандеву-хешу живых обработчиков берется менее загруженный. Пока
+    обработчик перезапускается, новые сессии уходят к остальным, а
+    вернувшийся (пустой) добирает их в первую очередь.
+    """
+
+    def __init__(self, workers, seeded=True, world_path=None):
+        self.workers = [Worker(index) for index in range(workers)]
+        self.seeded = seeded
+        self.world_path = world_path
+        self.stats = ServerStats()
+        self.next_session = 0
+        self.stopping = False
+        self.context = multiprocessing.get_context('spawn')
+
+    async def start(self):
+        await asyncio.gather(*(self.start_worker(worker)
+                               for worker in self.workers))
+
+    async def start_worker(self, worker):
+        parent, child = socket.socketpair()
+        worker.process = self.context.Process(
+            target=worker_main, args=(child, self.seeded, self.world_path),
+            name=f'labyrinth-worker-{worker.index}', daemon=True)
+        worker.process.start()
+        child.close()
+        reader, worker.writer = await asyncio.open_connection(sock=parent)
+        worker.generation += 1
+        worker.alive = True
+        asyncio.create_task(self.read_replies(worker, reader))
+
+    async def read_replies(self, worker, reader):
+        """Разбирает ответы обработчика; при его падении перезапускает его"""
+        with contextlib.suppress(asyncio.IncompleteReadError, ConnectionError):
+            while True:
+                kind, session, payload = await read_frame(reader)
+                if kind == LOAD:
+                    worker.load = LOAD_PAYLOAD.unpack(payload)
+                    continue
+                future = worker.pending.pop(session, None)
+                if future is not None and not future.done():
+                    executed, = REPLY_COUNT.unpack_from(payload)
+                    future.set_result(
+                        (kind, executed, payload[REPLY_COUNT.size:]))
+
+        worker.alive = False
+        worker.writer.close()
+        for future in worker.pending.values():
+            if not future.done():
+                future.set_exception(WorkerLost(worker.index))
+        worker.pending.clear()
+        await join_process(worker.process, 1)
+        if self.stopping:
+            return
+        worker.restarts += 1
+        print(f"Обработчик {worker.index} завершился (код "
+              f"{worker.process.exitcode}), перезапуск", file=sys.stderr)
+        await asyncio.sleep(RESTART_DELAY)
+        await self.start_worker(worker)
+
+    def pick_worker(self, session):
+        live = [worker for worker in self.workers if worker.alive]
+        if not live:
+            return None
+        live.sort(key=lambda worker: rendezvous_weight(session, worker.index),
+                  reverse=True)
+        return min(live[:2], key=lambda worker: worker.stats.active_sessions)
+
+    async def handle_client(self, reader, writer):
+        """Обслуживает одно подключение через закрепленный обработчик"""
+        self.next_session += 1
+        session = self.next_session
+        worker = self.pick_worker(session)
+        if worker is None:
+            writer.write("Сервер перезапускается, попробуйте позже.\n".encode())
+            writer.close()
+            return
+
+        all_stats = (self.stats, worker.stats)
+        for stats in all_stats:
+            stats.active_sessions += 1
+            stats.total_sessions += 1
+        kind = None
+        tail = b''
+        generation = worker.generation
+        try:
+            kind, _, payload = await worker.request(generation, OPEN, session)
+            while True:
+                writer.write(payload)
+                await writer.drain()
+                if kind == END:
+                    break
+                batch, tail = await read_batch(reader, tail)
+                if not batch:
+                    break
+                started = time.perf_counter()
+                kind, executed, payload = await worker.request(
+                    generation, INPUT, session, batch)
+                if not executed:
+                    continue
+                # Команды пакета выполняются подряд и отвечают одним кадром:
+                # задержка команды - доля задержки пакета
+                latency = (time.perf_counter() - started) / executed
+                for stats in all_stats:
+                    stats.latencies.extend([latency] * executed)
+                    stats.commands += executed
+        except WorkerLost:
+            kind = END
+            with contextlib.suppress(ConnectionError):
+                writer.write("\nСессия прервана: обработчик перезапущен.\n"
+                             .encode())
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for stats in all_stats:
+                stats.active_sessions -= 1
+            if kind != END and worker.alive and generation == worker.generation:
+                worker.pending.pop(session, None)
+                worker.writer.write(encode_frame(CLOSE, session))
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    def summary(self):
+        """Сводка роутера и нагрузка каждого обработчика"""
+        return '\n'.join([self.stats.summary()] +
+                         [worker.summary() for worker in self.workers])
+
+    async def shutdown(self):
+        """Закрывает каналы: обработчики завершаются, прочитав конец"""
+        self.stopping = True
+        for worker in self.workers:
+            if worker.alive:
+                worker.writer.close()
+        await asyncio.gather(*(join_process(worker.process, 5)
+                               for worker in self.workers
+                               if worker.process is not None))
+
+
+async def serve_router(host=None, port=None, unix_path=None, workers=2,
+                       stats_interval=0, seeded=True, world_path=None):
+    """
+    Запускает обработчики и роутер и обслуживает сессии до остановки
+    """
+    router = Router(workers, seeded, world_path)
+    await router.start()
+
+    servers = []
+    if port is not None:
+        servers.append(await asyncio.start_server(
+            router.handle_client, host, port, backlog=4096))
+    if unix_path:
+        servers.append(await asyncio.start_unix_server(
+            router.handle_client, unix_path, backlog=4096))
+    if not servers:
+        raise ValueError("Укажите --port и/или --unix")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(signum, stop.set)
+
+    reporter = None
+    if stats_interval:
+        reporter = asyncio.create_task(report_stats(router, stats_interval))
+    try:
+        await stop.wait()
+    finally:
+        if reporter:
+            reporter.cancel()
+        for server in servers:
+            server.close()
+        await router.shutdown()
+        print(router.summary(), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Сервер Лабиринта сокровищ с процессами-обработчиками")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help="TCP-порт")
+    parser.add_argument('--unix', help="путь к Unix-сокету")
+    parser.add_argument('-w', '--workers', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help="число процессов-обработчиков")
+    parser.add_argument('--stats-interval', type=float, default=0,
+                        help="период вывода нагрузки в секундах")
+    parser.add_argument('--unseeded', action='store_true',
+                        help="одинаковая последовательность событий "
+                             "во всех сессиях (без зерна)")
+    parser.add_argument('--world', help="файл мира (по умолчанию встроенный)")
+    args = parser.parse_args(argv)
+
+    if args.port is None and not args.unix:
+        parser.error("нужен хотя бы один из --port или --unix")
+
+    asyncio.run(serve_router(args.host, args.port, args.unix, args.workers,
+                             args.stats_interval, not args.unseeded,
+                             args.world))
+
+
+if __name__ == "__main__":
+    main()
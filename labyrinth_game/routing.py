@@ -0,0 +1,267 @@
+# Маршруты по карте: индекс кратчайших путей и достижимости комнат
+from collections import OrderedDict, deque
+
+from .items import get_rules, session_rules
+
+# Для карт не больше этого размера таблицы для всех комнат строятся сразу
+# (если дверей с разными ключами немного: таблиц по числу сочетаний ключей)
+EAGER_LIMIT = 2000
+EAGER_KEYS = 4
+
+# Карты больше этого размера не строят таблиц на всю карту: путь к новой
+# цели ищется обходом от игрока, который заканчивается на цели
+FULL_TABLE_LIMIT = 50_000
+
+# Сколько записей всего хранят таблицы маршрутов больших карт (около
+# 120 байт на запись)
+MAX_ENTRIES = 1_000_000
+
+
+class RouteIndex:
+    """
+    Индекс кратчайших путей по выходам комнат
+
+    Для каждой цели и набора ключей хранится таблица
+    {комната: (направление, расстояние)}: первый шаг к цели и длина пути.
+    На картах до FULL_TABLE_LIMIT комнат таблица строится одним обходом в
+    ширину по обратным ребрам и отвечает на любой запрос к этой цели. На
+    больших картах таблица хранит только комнаты уже найденных путей к
+    цели: запрос из другой комнаты ищет путь обходом от нее (его цена
+    растет с расстоянием до цели, а не с размером карты).
+    """
+
+    def __init__(self, world):
+        self.world = world
+        # Чтение комнат при обходах: мир из файла умеет читать их мимо
+        # своего кэша (MappedWorld.peek), словарь - обычным get
+        self.peek = getattr(world, 'peek', world.get)
+        # Двери, требующие предмета (items.DOOR_REQUIREMENTS для мира)
+        self.rules = get_rules(world)
+        self._reverse = None
+        self.large = len(world) > FULL_TABLE_LIMIT
+        self.tables = OrderedDict()
+        # Число записей в каждой таблице кэша и во всех вместе
+        self.sizes = {}
+        self.entries = 0
+        if len(world) <= EAGER_LIMIT and len(self.rules.keys) <= EAGER_KEYS:
+            for keys in self._key_sets():
+                for room_name in world:
+                    self.table(room_name, keys)
+
+    @property
+    def reverse(self):
+        """
+        Обратный граф: {комната: [(откуда, направление), ...]}
+
+        Строится при первом запросе к цели на картах до FULL_TABLE_LIMIT
+        комнат: для мира из файла это читает все комнаты, а прямые обходы
+        (table_from, find_path) его не требуют.
+        """
+        if self._reverse is None:
+            reverse = {}
+            for room_name, room_data in self.world.items():
+                for direction, next_room in room_data.get('exits', {}).items():
+                    reverse.setdefault(next_room, []).append(
+                        (room_name, direction))
+            self._reverse = reverse
+        return self._reverse
+
+    def _key_sets(self):
+        """Все сочетания ключей, от которых зависят маршруты"""
+        keys = sorted(self.rules.keys)
+        sets = [frozenset()]
+        for key in keys:
+            sets += [keys_set | {key} for keys_set in sets]
+        return sets
+
+    def table(self, target, keys):
+        """
+        Таблица первых шагов к цели target для игрока с ключами keys
+        """
+        cache_key = (target, keys)
+        table = self.tables.get(cache_key)
+        if table is not None:
+            self.tables.move_to_end(cache_key)
+            return table
+
+        doors = self.rules.doors
+        table = {target: (None, 0)}
+        queue = deque([target])
+        while queue:
+            room_name = queue.popleft()
+            # В запертую комнату нельзя войти без ключа
+            required = doors.get(room_name)
+            if required and required not in keys:
+                continue
+            distance = table[room_name][1] + 1
+            for previous, direction in self.reverse.get(room_name, ()):
+                if previous not in table:
+                    table[previous] = (direction, distance)
+                    queue.append(previous)
+
+        self._remember(cache_key, table)
+        return table
+
+    def exits(self, room_name):
+        """Выходы комнаты, прочитанные мимо кэша комнат мира"""
+        return self.peek(room_name, {}).get('exits', {})
+
+    def table_from(self, source, keys, targets=None):
+        """
+        Таблица {комната: (первый шаг из source, расстояние)} для комнат,
+        достижимых из source (прямой обход в ширину)
+
+        Если заданы targets, обход останавливается, как только все они
+        получили расстояние: таблица содержит только комнаты не дальше
+        самой дальней цели и не кэшируется.
+        """
+        if targets is None:
+            cache_key = ('from', source, keys)
+            table = self.tables.get(cache_key)
+            if table is not None:
+                self.tables.move_to_end(cache_key)
+                return table
+            remaining = None
+        else:
+            remaining = set(targets)
+            remaining.discard(source)
+
+        doors = self.rules.doors
+        table = {source: (None, 0)}
+        queue = deque([source])
+        while queue and (remaining is None or remaining):
+            room_name = queue.popleft()
+            first, distance = table[room_name]
+            for direction, next_room in self.exits(room_name).items():
+                required = doors.get(next_room)
+                if next_room in table or (required and required not in keys):
+                    continue
+                table[next_room] = (first or direction, distance + 1)
+                queue.append(next_room)
+                if remaining is not None:
+                    remaining.discard(next_room)
+
+        if targets is None:
+            self._remember(cache_key, table)
+        return table
+
+    def find_path(self, source, target, keys):
+        """
+        Кратчайший путь обходом в ширину от source, который заканчивается
+        на цели: список пар (комната, направление) или None, если пути нет
+        """
+        if source == target:
+            return []
+        doors = self.rules.doors
+        parents = {source: None}
+        queue = deque([source])
+        while queue:
+            room_name = queue.popleft()
+            for direction, next_room in self.exits(room_name).items():
+                required = doors.get(next_room)
+                if next_room in parents or (required and required not in keys):
+                    continue
+                parents[next_room] = (room_name, direction)
+                if next_room == target:
+                    path = []
+                    while parents[next_room] is not None:
+                        next_room, direction = parents[next_room]
+                        path.append((next_room, direction))
+                    path.reverse()
+                    return path
+                queue.append(next_room)
+        return None
+
+    def step(self, source, target, keys=frozenset()):
+        """(первый шаг, расстояние) от source к target или None"""
+        if not self.large:
+            return self.table(target, keys).get(source)
+
+        cache_key = (target, keys)
+        table = self.tables.get(cache_key)
+        if table is not None and source in table:
+            self.tables.move_to_end(cache_key)
+            return table[source]
+        path = self.find_path(source, target, keys)
+        if path is None:
+            return None
+        # Отрезки кратчайшего пути - тоже кратчайшие пути к цели
+        if table is None:
+            table = {target: (None, 0)}
+        for distance, (room_name, direction) in enumerate(reversed(path), 1):
+            table[room_name] = (direction, distance)
+        self._remember(cache_key, table)
+        return table[source]
+
+    def _remember(self, cache_key, table):
+        """
+        Кладет таблицу в кэш; на больших картах вытесняет самые старые,
+        пока записей больше MAX_ENTRIES
+        """
+        self.tables[cache_key] = table
+        self.tables.move_to_end(cache_key)
+        self.entries += len(table) - self.sizes.get(cache_key, 0)
+        self.sizes[cache_key] = len(table)
+        if len(self.world) <= EAGER_LIMIT:
+            return
+        while self.entries > MAX_ENTRIES and len(self.tables) > 1:
+            old_key, _ = self.tables.popitem(last=False)
+            self.entries -= self.sizes.pop(old_key)
+
+    def next_step(self, source, target, keys=frozenset()):
+        """Направление первого шага от source к target или None"""
+        step = self.step(source, target, keys)
+        return step[0] if step else None
+
+    def distance(self, source, target, keys=frozenset()):
+        """Длина кратчайшего пути или None, если цель недостижима"""
+        step = self.step(source, target, keys)
+        return step[1] if step else None
+
+    def is_reachable(self, source, target, keys=frozenset()):
+        """Можно ли дойти от source до target"""
+        return self.step(source, target, keys) is not None
+
+    def route(self, source, target, keys=frozenset()):
+        """Список направлений от source до target (пустой, если пути нет)"""
+        if self.large:
+            path = self.find_path(source, target, keys)
+            return [direction for _, direction in path or ()]
+        table = self.table(target, keys)
+        if source not in table:
+            return []
+        directions = []
+        room_name = source
+        while room_name != target:
+            direction = table[room_name][0]
+            directions.append(direction)
+            room_name = self.exits(room_name)[direction]
+        return directions
+
+
+# Кэш индексов по картам: {id(карты): RouteIndex}
+_INDEXES = {}
+
+
+def get_route_index(world):
+    """
+    Индекс маршрутов для карты (строится один раз и кэшируется)
+    """
+    index = _INDEXES.get(id(world))
+    if index is None or index.world is not world:
+        index = _INDEXES[id(world)] = RouteIndex(world)
+    return index
+
+
+def invalidate_routes(world=None):
+    """Сбрасывает кэш маршрутов после изменения карты (или всех карт)"""
+    if world is None:
+        _INDEXES.clear()
+    else:
+        _INDEXES.pop(id(world), None)
+
+
+def held_keys(game_state):
+    """Ключи от запертых комнат, которые есть у игрока"""
+    keys = session_rules(game_state).keys
+    return frozenset(item for item in game_state.player_inventory if item in keys)
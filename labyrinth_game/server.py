@@ -0,0 +1,406 @@
+# Сетевой сервер: много игровых сессий в одном цикле событий asyncio
+import argparse
+import asyncio
+import contextlib
+import cProfile
+import random
+import signal
+import sys
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .events import emit, encode_events, take_events
+from .hibernation import Hibernation
+from .main import run_commands, show_intro, split_commands
+from .metrics import Metrics, start_http_server
+from .output import NullSink, SocketSink, flush_output
+from .persistence import SessionStore, encode_snapshot, is_session_id
+from .rng import warm_up
+from .session import new_game_state
+from .utils import describe_current_room, show_prompt
+
+# Сколько последних замеров задержки хранить для расчета перцентилей
+LATENCY_WINDOW = 100_000
+
+# Как часто сбрасывать журналы сессий на диск (group commit), секунды
+COMMIT_INTERVAL = 0.005
+
+# Как часто переписывать файл метрик, секунды
+METRICS_INTERVAL = 10
+
+# Сколько байт читать из сокета за раз и предел длины одной строки ввода
+READ_SIZE = 65536
+MAX_LINE = 65536
+
+
+class ServerStats:
+    """
+    Счетчики сервера: активные сессии и задержки обработки команд
+    """
+
+    def __init__(self):
+        self.active_sessions = 0
+        self.total_sessions = 0
+        self.commands = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        # Общий для всех сессий реестр метрик Prometheus (если включен)
+        self.metrics = None
+        # Спячка неактивных сессий (hibernation.Hibernation), если включена
+        self.hibernation = None
+
+    def percentile(self, p):
+        """Перцентиль задержки команды в секундах"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        return ordered[index]
+
+    def summary(self):
+        """Краткая сводка для журнала сервера"""
+        summary = (f"сессий: {self.active_sessions} активных, "
+                   f"{self.total_sessions} всего; команд: {self.commands}; "
+                   f"p50={self.percentile(50) * 1000:.3f} мс, "
+                   f"p99={self.percentile(99) * 1000:.3f} мс")
+        if self.hibernation:
+            summary += f"; {self.hibernation.summary()}"
+        return summary
+
+
+class Journal:
+    """
+    Сохранение сессий сервера: SessionStore плюс поток для работы с диском
+
+    Все обращения к файлам идут через один поток по очереди, поэтому
+    снимок сессии всегда ложится после уже поставленных записей журнала,
+    а цикл событий не ждет fsync.
+    """
+
+    def __init__(self, directory, snapshot_every=200):
+        self.store = SessionStore(directory, snapshot_every)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.active = set()
+
+    def submit(self, func, *args):
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(report_io_error)
+        return future
+
+    async def run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def start(self, session_id, game_state):
+        """Начальный снимок пишется до первой команды сессии"""
+        self.submit(self.store.write_snapshot, session_id,
+                    self.store.start(session_id, game_state))
+
+    def record(self, session_id, game_state, user_input):
+        if self.store.record(session_id, game_state, user_input):
+            self.submit(self.store.write_snapshot, session_id,
+                        encode_snapshot(game_state))
+
+    async def resume(self, session_id):
+        """Состояние сохраненной сессии или None"""
+        # Код приходит от клиента: только коды вида uuid4().hex[:12]
+        if (not is_session_id(session_id) or session_id in self.active
+                or not self.store.exists(session_id)):
+            return None
+        # Пока сессия загружается, второе подключение не может ее занять
+        self.active.add(session_id)
+        game_state = await self.run(self.store.load, session_id)
+        if game_state is None:
+            self.active.discard(session_id)
+        return game_state
+
+    def close(self, session_id, game_state):
+        """Снимок при выходе: журнал сессии больше не понадобится"""
+        self.active.discard(session_id)
+        self.submit(self.store.write_snapshot, session_id,
+                    encode_snapshot(game_state))
+
+    async def commit_forever(self, interval=COMMIT_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            if self.store.pending:
+                await self.run(self.store.commit)
+
+    def shutdown(self):
+        self.executor.submit(self.store.close)
+        self.executor.shutdown(wait=True)
+
+
+def report_io_error(future):
+    error = future.exception()
+    if error is not None:
+        print(f"Ошибка сохранения сессии: {error!r}", file=sys.stderr)
+
+
+def send_output(game_state, writer, prompt=True):
+    """
+    Отправляет вывод пакета команд и приглашение одной записью: текстом
+    или, если сессия собирает события, строками JSON (см. events)
+    """
+    if prompt:
+        show_prompt(game_state)
+    if game_state.events is None:
+        flush_output(game_state)
+    elif game_state.events:
+        writer.write(encode_events(take_events(game_state)))
+
+
+async def read_batch(reader, tail=b''):
+    """
+    Все целые строки ввода, пришедшие от клиента к этому моменту
+
+    Клиент может прислать несколько строк сразу, не дожидаясь ответов:
+    они выполняются одним пакетом, и вывод уходит одной записью.
+
+    Args:
+        tail: Недописанная строка, оставшаяся от прошлого чтения
+
+    Returns:
+        tuple: (строки с переводом строки в конце, новый хвост); пустые
+            строки означают конец ввода
+    """
+    while True:
+        data = await reader.read(READ_SIZE)
+        if not data:
+            # Как readline: недописанная строка в конце ввода тоже команда
+            return tail, b''
+        tail += data
+        if b'\n' in data:
+            batch, _, tail = tail.rpartition(b'\n')
+            return batch + b'\n', tail
+        if len(tail) > MAX_LINE:
+            # Клиент не присылает перевода строки - считаем ввод оконченным
+            return b'', b''
+
+
+async def resume_session(reader, writer, game_state, journal):
+    """
+    Предлагает продолжить сохраненную сессию командой "resume <код>"
+
+    Returns:
+        tuple: (game_state, код сессии, первая строка ввода или None)
+    """
+    session_id = uuid.uuid4().hex[:12]
+    emit(game_state, 'session_started', session_id)
+    send_output(game_state, writer)
+    await writer.drain()
+
+    line = await reader.readline()
+    words = line.decode(errors='replace').split()
+    if len(words) != 2 or words[0] != 'resume':
+        journal.active.add(session_id)
+        journal.start(session_id, game_state)
+        return game_state, session_id, line
+
+    saved = await journal.resume(words[1])
+    if saved is None:
+        emit(game_state, 'session_not_found', words[1])
+        journal.active.add(session_id)
+        journal.start(session_id, game_state)
+        return game_state, session_id, None
+
+    saved.output = game_state.output
+    saved.events = game_state.events
+    emit(saved, 'session_resumed', words[1])
+    describe_current_room(saved)
+    return saved, words[1], None
+
+
+async def handle_session(reader, writer, stats, seeded=True, world_path=None,
+                         journal=None, events=False):
+    """
+    Обслуживает одно подключение: отдельный game_state на каждого игрока
+
+    Args:
+        events (bool): Отвечать событиями в JSON вместо текста
+    """
+    # У каждой сессии свой поток случайных событий
+    seed = random.getrandbits(31) if seeded else None
+    game_state = new_game_state(seed, world_path)
+    if events:
+        game_state.output = NullSink()
+        game_state.events = []
+    else:
+        game_state.output = SocketSink(writer)
+    session_id = None
+    sessions = stats.hibernation
+
+    def on_command(user_input, seconds):
+        if journal:
+            journal.record(session_id, game_state, user_input)
+        stats.latencies.append(seconds)
+        stats.commands += 1
+
+    stats.active_sessions += 1
+    stats.total_sessions += 1
+    try:
+        show_intro(game_state)
+        batch = None
+        tail = b''
+        if journal:
+            game_state, session_id, batch = await resume_session(
+                reader, writer, game_state, journal)
+        if stats.metrics:
+            game_state.metrics = stats.metrics
+        while not game_state.game_over:
+            if batch is None:
+                # Вывод пакета команд и приглашение уходят одной записью
+                send_output(game_state, writer)
+                await writer.drain()
+                batch, tail = await read_batch(reader, tail)
+            if not batch:
+                break
+            commands = split_commands(batch.decode(errors='replace'))
+            batch = None
+
+            if sessions:
+                sessions.touch(game_state)
+            run_commands(game_state, commands, on_command=on_command)
+        send_output(game_state, writer, prompt=False)
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        stats.active_sessions -= 1
+        if sessions:
+            sessions.forget(game_state)
+        if session_id:
+            journal.close(session_id, game_state)
+        writer.close()
+        with contextlib.suppress(ConnectionError):
+            await writer.wait_closed()
+
+
+async def report_stats(stats, interval):
+    """Периодически печатает сводку в stderr"""
+    while True:
+        await asyncio.sleep(interval)
+        print(stats.summary(), file=sys.stderr)
+
+
+async def write_metrics(metrics, path, interval=METRICS_INTERVAL):
+    """Периодически переписывает файл метрик"""
+    while True:
+        await asyncio.sleep(interval)
+        metrics.write_textfile(path)
+
+
+async def serve(host=None, port=None, unix_path=None, stats_interval=0,
+                seeded=True, world_path=None, data_dir=None, snapshot_every=200,
+                metrics=None, metrics_file=None, max_resident=0,
+                hibernate_dir=None, events=False):
+    """
+    Запускает TCP и/или Unix-сервер и обслуживает сессии до остановки
+    """
+    if seeded:
+        warm_up()
+    stats = ServerStats()
+    stats.metrics = metrics
+    if max_resident:
+        stats.hibernation = Hibernation(max_resident, hibernate_dir, metrics)
+    journal = Journal(data_dir, snapshot_every) if data_dir else None
+
+    async def on_connect(reader, writer):
+        await handle_session(reader, writer, stats, seeded, world_path, journal,
+                             events)
+
+    servers = []
+    if port is not None:
+        servers.append(await asyncio.start_server(
+            on_connect, host, port, backlog=4096))
+    if unix_path:
+        servers.append(await asyncio.start_unix_server(
+            on_connect, unix_path, backlog=4096))
+    if not servers:
+        raise ValueError("Укажите --port и/или --unix")
+
+    # Останавливаемся по SIGINT/SIGTERM, напечатав итоговую статистику
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(signum, stop.set)
+
+    tasks = []
+    if stats_interval:
+        tasks.append(asyncio.create_task(report_stats(stats, stats_interval)))
+    if journal:
+        tasks.append(asyncio.create_task(journal.commit_forever()))
+    if metrics_file:
+        tasks.append(asyncio.create_task(write_metrics(metrics, metrics_file)))
+    try:
+        await stop.wait()
+    finally:
+        for task in tasks:
+            task.cancel()
+        for server in servers:
+            server.close()
+        if journal:
+            journal.shutdown()
+        if stats.hibernation:
+            stats.hibernation.close()
+        if metrics_file:
+            metrics.write_textfile(metrics_file)
+        print(stats.summary(), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сервер Лабиринта сокровищ")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help="TCP-порт")
+    parser.add_argument('--unix', help="путь к Unix-сокету")
+    parser.add_argument('--stats-interval', type=float, default=0,
+                        help="период вывода статистики в секундах")
+    parser.add_argument('--unseeded', action='store_true',
+                        help="одинаковая последовательность событий "
+                             "во всех сессиях (без зерна)")
+    parser.add_argument('--world', help="файл мира (по умолчанию встроенный)")
+    parser.add_argument('--data-dir',
+                        help="каталог для сохранения сессий (журналы и снимки)")
+    parser.add_argument('--snapshot-every', type=int, default=200,
+                        help="снимок состояния раз в столько команд сессии")
+    parser.add_argument('--events', action='store_true',
+                        help="отвечать событиями (строки JSON) вместо текста")
+    parser.add_argument('--max-resident', type=int, default=0,
+                        help="держать в памяти не больше стольких сессий, "
+                             "остальные - в спячке на диске (0 - все в памяти)")
+    parser.add_argument('--hibernate-dir',
+                        help="каталог для спящих сессий (по умолчанию временный)")
+    parser.add_argument('--metrics-file',
+                        help="файл метрик Prometheus (обновляется периодически)")
+    parser.add_argument('--metrics-port', type=int,
+                        help="отдавать метрики по HTTP на этом порту")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="записать статистику cProfile за время работы")
+    args = parser.parse_args(argv)
+
+    if args.port is None and not args.unix:
+        parser.error("нужен хотя бы один из --port или --unix")
+
+    metrics = None
+    if args.metrics_file or args.metrics_port:
+        metrics = Metrics()
+    if args.metrics_port:
+        start_http_server(metrics, args.metrics_port, args.host)
+
+    server = serve(args.host, args.port, args.unix, args.stats_interval,
+                   not args.unseeded, args.world, args.data_dir,
+                   args.snapshot_every, metrics, args.metrics_file,
+                   args.max_resident, args.hibernate_dir, args.events)
+    if args.profile:
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(asyncio.run, server)
+        finally:
+            profiler.dump_stats(args.profile)
+    else:
+        asyncio.run(server)
+
+
+if __name__ == "__main__":
+    main()
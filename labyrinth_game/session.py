@@ -0,0 +1,263 @@
+# Игровая сессия: создание и сериализация состояния игрока
+from .constants import ITEM_DESCRIPTIONS
+from .world import load_world, start_room
+
+# Биты предметов для маски инвентаря: {предмет: 1 << номер}. Предметы
+# встроенного мира получают младшие биты, новые (из файлов миров)
+# добавляются при первой встрече.
+ITEM_BITS = {item: 1 << i for i, item in enumerate(ITEM_DESCRIPTIONS)}
+
+# До такой длины списка посещенных комнат проверка "in" идет перебором
+VISITED_SCAN_LIMIT = 16
+
+
+def item_bit(item_name):
+    """Бит предмета в маске инвентаря"""
+    bit = ITEM_BITS.get(item_name)
+    if bit is None:
+        bit = ITEM_BITS[item_name] = 1 << len(ITEM_BITS)
+    return bit
+
+
+class Inventory(list):
+    """
+    Инвентарь: обычный список (порядок и повторы предметов сохраняются)
+    с битовой маской, по которой проверка "предмет in инвентарь" - O(1)
+    """
+
+    __slots__ = ('mask',)
+
+    def __init__(self, items=()):
+        super().__init__(items)
+        self._rebuild()
+
+    def _rebuild(self):
+        mask = 0
+        for item in list.__iter__(self):
+            mask |= item_bit(item)
+        self.mask = mask
+
+    def _forget(self, item):
+        """Снимает бит предмета, если его последний экземпляр убран"""
+        if not list.__contains__(self, item):
+            self.mask &= ~item_bit(item)
+
+    def __contains__(self, item):
+        return self.mask & ITEM_BITS.get(item, 0) != 0
+
+    def append(self, item):
+        super().append(item)
+        self.mask |= item_bit(item)
+
+    def insert(self, index, item):
+        super().insert(index, item)
+        self.mask |= item_bit(item)
+
+    def extend(self, items):
+        super().extend(items)
+        self._rebuild()
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def remove(self, item):
+        super().remove(item)
+        self._forget(item)
+
+    def pop(self, index=-1):
+        item = super().pop(index)
+        self._forget(item)
+        return item
+
+    def clear(self):
+        super().clear()
+        self.mask = 0
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._rebuild()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._rebuild()
+
+
+class VisitedRooms(list):
+    """
+    Посещенные комнаты по порядку; у длинных списков проверка "in"
+    идет по множеству, а не перебором
+    """
+
+    __slots__ = ('index',)
+
+    def __init__(self, rooms=()):
+        super().__init__(rooms)
+        self.index = set(self) if len(self) > VISITED_SCAN_LIMIT else None
+
+    def __contains__(self, room_name):
+        if self.index is None:
+            return list.__contains__(self, room_name)
+        return room_name in self.index
+
+    def append(self, room_name):
+        super().append(room_name)
+        if self.index is not None:
+            self.index.add(room_name)
+        elif len(self) > VISITED_SCAN_LIMIT:
+            self.index = set(self)
+
+
+# Сохраняемые поля состояния и ключи, которые живут только в памяти процесса
+STATE_KEYS = ('player_inventory', 'current_room', 'visited_rooms', 'game_over',
+              'steps_taken', 'world_overlay', 'pending_prompt', 'rng_seed',
+              'world_path', 'journal_seq')
+TRANSIENT_KEYS = ('output', 'rng', 'metrics', 'room_versions', 'room_texts',
+                  'events')
+ALL_KEYS = STATE_KEYS + TRANSIENT_KEYS
+_KEY_SET = frozenset(ALL_KEYS)
+
+
+class GameState:
+    """
+    Состояние сессии в слотах
+
+    Код игры обращается к полям как к атрибутам (game_state.current_room).
+    Для кода, который ожидает dict, есть словарный интерфейс
+    (game_state['current_room'], get, setdefault, items): он медленнее
+    атрибутов, а неизвестный ключ дает KeyError, как у dict. Ключи - только
+    STATE_KEYS и TRANSIENT_KEYS; служебные поля без значения равны None
+    и считаются отсутствующими.
+    """
+
+    __slots__ = ('_inventory', 'current_room', '_visited', 'game_over',
+                 'steps_taken', 'world_overlay', 'pending_prompt', 'rng_seed',
+                 'world_path', 'journal_seq') + TRANSIENT_KEYS
+
+    def __init__(self, player_inventory=(), current_room='entrance',
+                 visited_rooms=None, game_over=False, steps_taken=0,
+                 world_overlay=None, pending_prompt=None, rng_seed=None,
+                 world_path=None, journal_seq=0):
+        self.player_inventory = player_inventory
+        self.current_room = current_room
+        self.visited_rooms = (visited_rooms if visited_rooms is not None
+                              else [current_room])
+        self.game_over = game_over
+        self.steps_taken = steps_taken
+        self.world_overlay = world_overlay if world_overlay is not None else {}
+        self.pending_prompt = pending_prompt
+        self.rng_seed = rng_seed
+        self.world_path = world_path
+        self.journal_seq = journal_seq
+        self.output = self.rng = self.metrics = None
+        # Список для событий команды (см. events.emit), если они нужны
+        self.events = None
+        # Версии измененных комнат и их описания (см. world.room_version)
+        self.room_versions = self.room_texts = None
+
+    @property
+    def player_inventory(self):
+        return self._inventory
+
+    @player_inventory.setter
+    def player_inventory(self, items):
+        self._inventory = items if isinstance(items, Inventory) else Inventory(items)
+
+    @property
+    def visited_rooms(self):
+        return self._visited
+
+    @visited_rooms.setter
+    def visited_rooms(self, rooms):
+        self._visited = (rooms if isinstance(rooms, VisitedRooms)
+                         else VisitedRooms(rooms))
+
+    # Словарный интерфейс
+    def __getitem__(self, key):
+        if key not in _KEY_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    __setitem__ = object.__setattr__
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            setattr(self, key, default)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in STATE_KEYS or (
+            key in TRANSIENT_KEYS and getattr(self, key) is not None)
+
+    def __delitem__(self, key):
+        # Служебный ключ "удаляется" сбросом в None
+        if key not in TRANSIENT_KEYS:
+            raise KeyError(key)
+        setattr(self, key, None)
+
+    def keys(self):
+        return [key for key in ALL_KEYS if key in self]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def __repr__(self):
+        return f"GameState({dump_state(self)!r})"
+
+
+def new_game_state(seed=None, world_path=None):
+    """
+    Создает состояние новой игровой сессии
+
+    Args:
+        seed (int | None): Зерно случайных событий сессии. Без зерна
+            события зависят только от числа шагов, как раньше.
+        world_path (str | None): Файл мира; по умолчанию встроенный ROOMS
+    """
+    start = start_room(load_world(world_path)) if world_path else 'entrance'
+    return GameState(
+        current_room=start,  # Текущая комната
+        rng_seed=seed,  # Зерно потока случайных чисел
+        world_path=world_path  # Файл мира (None - встроенный мир)
+    )
+
+
+def dump_state(game_state):
+    """
+    Возвращает сериализуемую копию состояния без служебных объектов
+    (обычный dict со списками)
+    """
+    return {key: list(value) if isinstance(value, list) else value
+            for key, value in game_state.items()
+            if key not in TRANSIENT_KEYS}
+
+
+def load_state(data):
+    """Восстанавливает состояние сессии из dump_state"""
+    return GameState(**{key: data[key] for key in STATE_KEYS if key in data})
+
+
+def release_state(game_state):
+    """
+    Освобождает коллекции сессии, оставляя только скалярные поля
+    (для спячки: коллекции сначала сохраняются на диск)
+    """
+    game_state._inventory = game_state._visited = None
+    game_state.world_overlay = None
+    game_state.room_versions = game_state.room_texts = None
+
+
+def restore_state(game_state, saved):
+    """Возвращает коллекции сессии из сохраненной копии состояния"""
+    game_state.player_inventory = saved.player_inventory
+    game_state.visited_rooms = saved.visited_rooms
+    game_state.world_overlay = saved.world_overlay
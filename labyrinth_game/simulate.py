@@ -0,0 +1,264 @@
+# Симулятор прохождений методом Монте-Карло с параллельным пулом процессов
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from .items import session_rules
+from .main import process_command
+from .output import NullSink
+from .rng import prime_stream, warm_up
+from .session import new_game_state
+from .world import get_room
+
+# Заведомо неверный ответ на загадку или код
+WRONG_ANSWER = 'не знаю'
+
+
+def answer_for(game_state, rnd, p_correct):
+    """Ответ на заданный игрой вопрос: верный с вероятностью p_correct"""
+    prompt = game_state.pending_prompt
+    if prompt == 'treasure_choice':
+        return 'да'
+    if rnd.random() >= p_correct:
+        return WRONG_ANSWER
+    room_data = get_room(game_state, game_state.current_room)
+    return room_data['puzzle'][1]
+
+
+def random_policy(game_state, rnd, p_correct):
+    """
+    Случайное действие из доступных в текущей комнате
+    """
+    if game_state.pending_prompt:
+        return answer_for(game_state, rnd, p_correct)
+
+    current_room = game_state.current_room
+    room_data = get_room(game_state, current_room)
+    exits = list(room_data.get('exits', {}))
+    items = [item for item in room_data.get('items', ())
+             if item != 'treasure_chest']
+    inventory = game_state.player_inventory
+    can_solve = bool(room_data.get('puzzle')) and (
+        not room_data.get('puzzle_solved') or current_room == 'treasure_room')
+
+    # Выбираем номер действия, не собирая строки всех вариантов;
+    # в тупике без предметов и загадки остается только осмотреться
+    actions = len(exits) + len(items) + len(inventory) + can_solve
+    if not actions:
+        return 'look'
+    choice = rnd.randrange(actions)
+    if choice < len(exits):
+        return "go " + exits[choice]
+    choice -= len(exits)
+    if choice < len(items):
+        return "take " + items[choice]
+    choice -= len(items)
+    if choice < len(inventory):
+        return "use " + inventory[choice]
+    return 'solve'
+
+
+def greedy_policy(game_state, rnd, p_correct):
+    """
+    Собирает все предметы, открывает шкатулку и решает загадки,
+    а затем уходит в случайном направлении
+    """
+    if game_state.pending_prompt:
+        return answer_for(game_state, rnd, p_correct)
+
+    current_room = game_state.current_room
+    room_data = get_room(game_state, current_room)
+    inventory = game_state.player_inventory
+
+    for item in room_data.get('items', ()):
+        if item != 'treasure_chest':
+            return f"take {item}"
+    gives = session_rules(game_state).gives
+    for item in inventory:
+        if item in gives and gives[item] not in inventory:
+            return f"use {item}"
+    if room_data.get('puzzle') and (not room_data.get('puzzle_solved')
+                                    or current_room == 'treasure_room'):
+        return 'solve'
+    exits = list(room_data.get('exits', {}))
+    if not exits:
+        return 'look'
+    return "go " + rnd.choice(exits)
+
+
+POLICIES = {
+    'random': random_policy,
+    'greedy': greedy_policy,
+}
+
+
+def play_run(run_id, policy, max_commands, p_correct):
+    """
+    Одно прохождение
+
+    Returns:
+        tuple: (исход, шагов, Counter потерянных предметов)
+    """
+    game_state = new_game_state(seed=run_id)
+    game_state.output = NullSink()
+    # Все броски событий на прогон считаются одним пакетом
+    prime_stream(game_state, max_commands + 2)
+    rnd = random.Random(run_id)
+    lost = Counter()
+
+    for _ in range(max_commands):
+        if game_state.game_over:
+            break
+        inventory = game_state.player_inventory
+        before = list(inventory)
+        process_command(game_state, policy(game_state, rnd, p_correct))
+        # Инвентарь уменьшается только из-за ловушки (trigger_trap)
+        if len(game_state.player_inventory) < len(before):
+            lost.update(Counter(before) - Counter(game_state.player_inventory))
+
+    if not game_state.game_over:
+        outcome = 'timeout'
+    elif 'treasure_chest' in get_room(game_state, 'treasure_room')['items']:
+        outcome = 'death'
+    else:
+        outcome = 'victory'
+    return outcome, game_state.steps_taken, lost
+
+
+def simulate_chunk(start, count, policy_name, max_commands, p_correct):
+    """
+    Пачка прохождений в одном процессе; возвращает агрегаты, а не
+    результаты отдельных прогонов, чтобы не гонять их между процессами
+    """
+    policy = POLICIES[policy_name]
+    outcomes = Counter()
+    victory_steps = Counter()
+    items_lost = Counter()
+    losses_per_run = Counter()
+    for run_id in range(start, start + count):
+        outcome, steps, lost = play_run(run_id, policy, max_commands, p_correct)
+        outcomes[outcome] += 1
+        if outcome == 'victory':
+            victory_steps[steps] += 1
+        items_lost.update(lost)
+        losses_per_run[sum(lost.values())] += 1
+    return outcomes, victory_steps, items_lost, losses_per_run
+
+
+def chunks(total, size, first=0):
+    """Разбивает номера прогонов на пачки (начало, количество)"""
+    for start in range(first, first + total, size):
+        yield start, min(size, first + total - start)
+
+
+def quantile(histogram, q):
+    """Квантиль по гистограмме {значение: частота}"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    threshold = q * total
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if seen >= threshold:
+            return value
+    return None
+
+
+def simulate(runs, policy='random', max_commands=200, p_correct=0.5,
+             jobs=None, chunk_size=2000, first_run=0):
+    """
+    Запускает runs прохождений на всех ядрах и сводит статистику
+    """
+    jobs = jobs or os.cpu_count()
+    # До запуска пула: процессы пула получают уже загруженный NumPy
+    warm_up()
+    totals = [Counter(), Counter(), Counter(), Counter()]
+    parts = list(chunks(runs, chunk_size, first_run))
+    args = (policy, max_commands, p_correct)
+
+    if jobs > 1 and len(parts) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(simulate_chunk, start, count, *args)
+                       for start, count in parts]
+            for future in futures:
+                for total, part in zip(totals, future.result()):
+                    total.update(part)
+    else:
+        for start, count in parts:
+            for total, part in zip(totals, simulate_chunk(start, count, *args)):
+                total.update(part)
+
+    outcomes, victory_steps, items_lost, losses_per_run = totals
+    victories = outcomes['victory']
+    return {
+        'runs': runs,
+        'policy': policy,
+        'outcomes': dict(outcomes),
+        'death_rate': outcomes['death'] / runs if runs else 0.0,
+        'victory_rate': victories / runs if runs else 0.0,
+        'steps_to_victory': {
+            'mean': (sum(s * n for s, n in victory_steps.items()) / victories
+                     if victories else None),
+            'p50': quantile(victory_steps, 0.5),
+            'p90': quantile(victory_steps, 0.9),
+            'histogram': dict(sorted(victory_steps.items())),
+        },
+        'items_lost': dict(items_lost.most_common()),
+        'losses_per_run': dict(sorted(losses_per_run.items())),
+    }
+
+
+def print_report(report, elapsed):
+    runs = report['runs']
+    speed = runs / elapsed if elapsed else 0.0
+    timeout_rate = report['outcomes'].get('timeout', 0) / runs if runs else 0.0
+    print(f"Прохождений: {runs} (стратегия {report['policy']}), "
+          f"{elapsed:.1f} с, {speed:.0f} прохождений/с")
+    print(f"Победы: {report['victory_rate']:.2%}, "
+          f"гибель в ловушке: {report['death_rate']:.2%}, "
+          f"не успели: {timeout_rate:.2%}")
+    steps = report['steps_to_victory']
+    if steps['mean'] is not None:
+        print(f"Шагов до победы: среднее {steps['mean']:.1f}, "
+              f"медиана {steps['p50']}, p90 {steps['p90']}")
+    print("Потерянные в ловушках предметы:")
+    for item, count in report['items_lost'].items():
+        print(f"  {item:<16} {count}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Монте-Карло симуляция прохождений Лабиринта")
+    parser.add_argument('--runs', type=int, default=10_000)
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='random')
+    parser.add_argument('--max-commands', type=int, default=200,
+                        help="лимит команд на одно прохождение")
+    parser.add_argument('--p-correct', type=float, default=0.5,
+                        help="вероятность верного ответа на загадку")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=2000,
+                        help="прохождений в одной задаче пула")
+    parser.add_argument('--json', action='store_true',
+                        help="вывести отчет в JSON")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    report = simulate(args.runs, args.policy, args.max_commands, args.p_correct,
+                      args.jobs, args.chunk_size)
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_report(report, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+# Решатель: кратчайший выигрышный сценарий для мира по правилам игры
+#
+# Поиск A* идет по состояниям (комната, инвентарь, решенные загадки,
+# сундук). В инвентаре учитываются только предметы, от которых зависят
+# правила: ключи запертых дверей и предметы, дающие другие предметы
+# (items.get_rules), и ключ от сундука. Остальные предметы на выигрыш не
+# влияют, поэтому даже мир с сотнями предметов дает не больше
+# комнат x 2^(важных предметов) состояний. Состояние - одно целое число:
+# номер комнаты и битовая маска важных предметов. Загадка и взятый предмет
+# важны только тем, какой предмет они дают, поэтому в маску они входят
+# через этот предмет. Случайные события и ловушки решатель не учитывает.
+import argparse
+import heapq
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from .items import get_rules, invalidate_rules
+from .routing import get_route_index, invalidate_routes
+from .world import DEFAULT_WORLD, load_world, start_room
+
+# Комната с сундуком и как его открыть
+TREASURE_ROOM = 'treasure_room'
+CHEST = 'treasure_chest'
+CHEST_KEY = 'treasure_key'
+
+# Ответ на вопрос "Ввести код?"
+CODE_CHOICE = 'да'
+
+# Признак выигрыша вместо следующего состояния
+WIN = -1
+
+
+class Solver:
+    """
+    Поиск кратчайшего выигрышного сценария в одном мире
+
+    Переходы из состояния вычисляются один раз и запоминаются, поэтому
+    повторные запросы (например, из разных стартовых комнат) дешевле.
+    """
+
+    def __init__(self, world):
+        self.world = world
+        self.routes = get_route_index(world)
+        self.rules = rules = get_rules(world)
+        items = sorted({*rules.keys, *rules.gives, *rules.gives.values(),
+                        CHEST_KEY})
+        self.bits = {item: 1 << i for i, item in enumerate(items)}
+        self.all_keys = rules.keys
+        self.shift = len(items)
+        # Номера комнат для ключей состояний: {комната: номер} и обратно
+        self.room_ids = {}
+        self.room_names = []
+        # {ключ состояния: [(строки ввода, следующий ключ или WIN), ...]}
+        self.transitions = {}
+        self.expanded = 0
+
+    def state_key(self, room_name, mask):
+        room_id = self.room_ids.get(room_name)
+        if room_id is None:
+            room_id = self.room_ids[room_name] = len(self.room_names)
+            self.room_names.append(room_name)
+        return room_id << self.shift | mask
+
+    def has(self, mask, item):
+        return mask & self.bits[item] != 0
+
+    def moves(self, key):
+        """Переходы из состояния: что ввести и куда это приводит"""
+        moves = self.transitions.get(key)
+        if moves is not None:
+            return moves
+
+        room_name = self.room_names[key >> self.shift]
+        mask = key & ((1 << self.shift) - 1)
+        room_data = self.world.get(room_name, {})
+        moves = []
+
+        # Переходы по выходам (move_player); в запертую комнату - с ключом
+        for direction, next_room in room_data.get('exits', {}).items():
+            required = self.rules.doors.get(next_room)
+            if required and not self.has(mask, required):
+                continue
+            moves.append(((f'go {direction}',), self.state_key(next_room, mask)))
+
+        # Важные предметы комнаты, которых еще нет (take_item)
+        for item in room_data.get('items', ()):
+            if item in self.bits and not self.has(mask, item):
+                moves.append(((f'take {item}',),
+                              self.state_key(room_name, mask | self.bits[item])))
+
+        # Предметы, которые дают другой предмет (use_item)
+        for item, result in self.rules.gives.items():
+            if self.has(mask, item) and not self.has(mask, result):
+                moves.append(((f'use {item}',),
+                              self.state_key(room_name, mask | self.bits[result])))
+
+        puzzle = room_data.get('puzzle')
+        if room_name == TREASURE_ROOM:
+            # solve у сундука открывает его ключом или кодом
+            # (attempt_open_treasure, check_treasure_code)
+            if CHEST in room_data.get('items', ()):
+                if self.has(mask, CHEST_KEY):
+                    moves.append((('solve',), WIN))
+                elif puzzle:
+                    moves.append((('solve', CODE_CHOICE, puzzle[1]), WIN))
+        elif puzzle:
+            # Загадка нужна только ради важной награды (check_puzzle_answer)
+            reward = room_data.get('reward')
+            if reward in self.bits and not self.has(mask, reward):
+                moves.append((('solve', puzzle[1]),
+                              self.state_key(room_name, mask | self.bits[reward])))
+
+        self.transitions[key] = moves
+        return moves
+
+    def estimate(self, key):
+        """
+        Нижняя оценка числа строк до выигрыша: путь до сокровищницы со
+        всеми ключами плюс хотя бы одна команда solve. None - недостижимо.
+        """
+        # Оценка нужна почти для каждой комнаты поиска, поэтому берется
+        # полная таблица к сокровищнице, а не поиск пути на каждый запрос
+        step = self.routes.table(TREASURE_ROOM, self.all_keys).get(
+            self.room_names[key >> self.shift])
+        return None if step is None else step[1] + 1
+
+    def solve(self, start=None):
+        """
+        Кратчайший выигрышный сценарий (список строк ввода) или None
+
+        Длина сценария считается в строках: ответ на загадку или код -
+        отдельная строка, как при вводе с клавиатуры.
+        """
+        if start is None:
+            start = start_room(self.world)
+        start_key = self.state_key(start, 0)
+        estimate = self.estimate(start_key)
+        if estimate is None:
+            return None
+
+        # Куча (оценка полной длины, длина пути, ключ); parents хранит
+        # лучший известный путь: {ключ: (длина, предыдущий ключ, строки)}
+        parents = {start_key: (0, None, ())}
+        heap = [(estimate, 0, start_key)]
+        best_win = None
+        while heap:
+            total, cost, key = heapq.heappop(heap)
+            if best_win is not None and total >= best_win[0]:
+                break
+            if cost > parents[key][0]:
+                continue
+            self.expanded += 1
+            for lines, next_key in self.moves(key):
+                next_cost = cost + len(lines)
+                if next_key == WIN:
+                    if best_win is None or next_cost < best_win[0]:
+                        best_win = (next_cost, key, lines)
+                    continue
+                known = parents.get(next_key)
+                if known is not None and known[0] <= next_cost:
+                    continue
+                estimate = self.estimate(next_key)
+                if estimate is None:
+                    continue
+                parents[next_key] = (next_cost, key, lines)
+                heapq.heappush(heap, (next_cost + estimate, next_cost, next_key))
+
+        if best_win is None:
+            return None
+        _, key, lines = best_win
+        script = [lines]
+        while key != start_key:
+            _, key, lines = parents[key]
+            script.append(lines)
+        return [line for lines in reversed(script) for line in lines]
+
+
+def shortest_script(world=None, start=None):
+    """Кратчайший выигрышный сценарий для мира (по умолчанию встроенного)"""
+    return Solver(DEFAULT_WORLD if world is None else world).solve(start)
+
+
+def check_script(script, seed=None, world_path=None):
+    """
+    Прогоняет сценарий через игру; True, если он привел к победе
+
+    Случайные события решатель не учитывает, поэтому с неудачным зерном
+    ловушка может отобрать ключ и сценарий не сработает.
+    """
+    from .batch import run_script
+    transcript, state, _ = run_script('\n'.join(script), seed, world_path)
+    return state['game_over'] and "Вы победили!" in transcript
+
+
+def check_generated(seed, rooms, options=None):
+    """
+    Решает сгенерированный мир: (зерно, длина сценария или None,
+    раскрыто состояний, секунд)
+    """
+    from .generator import generate_world
+    started = time.perf_counter()
+    world = dict(generate_world(rooms, seed, **(options or {})))
+    try:
+        solver = Solver(world)
+        script = solver.solve()
+    finally:
+        # Мир нужен только для этой проверки: индекс маршрутов и правила
+        # не должны оставаться в кэшах процесса
+        invalidate_routes(world)
+        invalidate_rules(world)
+    length = None if script is None else len(script)
+    return seed, length, solver.expanded, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Кратчайший выигрышный сценарий для мира Лабиринта")
+    parser.add_argument('--world', help="файл мира (по умолчанию встроенный)")
+    parser.add_argument('--start', help="стартовая комната (по умолчанию из мира)")
+    parser.add_argument('-o', '--output', help="записать сценарий в файл")
+    parser.add_argument('--verify', action='store_true',
+                        help="прогнать сценарий через игру")
+    parser.add_argument('--seed', type=int,
+                        help="зерно случайных событий для --verify")
+    parser.add_argument('--generate', type=int, metavar='ROOMS',
+                        help="проверить сгенерированные миры этого размера")
+    parser.add_argument('--count', type=int, default=10,
+                        help="сколько миров сгенерировать (зерна 0, 1, ...)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help="число параллельных процессов для --generate")
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        check = partial(check_generated, rooms=args.generate)
+        seeds = range(args.count)
+        if args.jobs > 1 and args.count > 1:
+            with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+                results = list(pool.map(check, seeds))
+        else:
+            results = [check(seed) for seed in seeds]
+        unsolvable = 0
+        for seed, length, expanded, elapsed in results:
+            verdict = "нет решения" if length is None else f"{length} строк"
+            unsolvable += length is None
+            print(f"зерно {seed}: {verdict}, состояний {expanded}, "
+                  f"{elapsed:.2f} с")
+        print(f"Миров: {len(results)}, без решения: {unsolvable}",
+              file=sys.stderr)
+        if unsolvable:
+            sys.exit(1)
+        return
+
+    world = load_world(args.world) if args.world else DEFAULT_WORLD
+    solver = Solver(world)
+    started = time.perf_counter()
+    script = solver.solve(args.start)
+    elapsed = time.perf_counter() - started
+    if script is None:
+        print("Выигрышного сценария нет", file=sys.stderr)
+        sys.exit(1)
+
+    text = '\n'.join(script) + '\n'
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    print(f"Строк: {len(script)}, состояний: {solver.expanded}, "
+          f"время: {elapsed * 1000:.1f} мс", file=sys.stderr)
+
+    if args.verify:
+        won = check_script(script, args.seed, args.world)
+        print("Проверка: победа" if won else "Проверка: сценарий не сработал",
+              file=sys.stderr)
+        if not won:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
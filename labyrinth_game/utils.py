@@ -1,47 +1,46 @@
 # Вспомогательные функции
-import math
-
-from .constants import COMMANDS, COMMANDS_HELP, MESSAGES, PUZZLES, ROOMS
-
-
-def pseudo_random(seed, modulo):
-    """
-    Генерирует псевдослучайное число на основе синуса
-    
-    Args:
-        seed (int): Начальное значение
-        modulo (int): Модуль для диапазона результата
-        
-    Returns:
-        int: Псевдослучайное число в диапазоне [0, modulo]
-    """
-    x = math.sin(seed * 12.9898) * 43758.5453
-    fractional = x - math.floor(x)
-    result = fractional * modulo
-    return int(result)
+import os
+
+from .answers import check_answer
+from .commands import ALIAS_INDEX, resolve_command
+from .constants import COMMANDS_HELP, DIRECTIONS, MESSAGES, PROMPTS, PUZZLES
+from .events import emit
+from .metrics import count_event
+from .output import say
+from .rng import draw
+from .routing import get_route_index, held_keys
+from .world import (
+    add_room_item,
+    get_room,
+    get_world,
+    mark_puzzle_solved,
+    remove_room_item,
+    room_text,
+)
 
 
 def trigger_trap(game_state):
     """
     Активирует ловушку с негативными последствиями для игрока
     """
-    print("Ловушка активирована! Пол стал дрожать...")
+    emit(game_state, 'trap_triggered', game_state.current_room)
+    count_event(game_state, 'trap')
     
-    inventory = game_state.get('player_inventory', [])
+    inventory = game_state.player_inventory
     
     if inventory:
         # Выбираем случайный предмет для удаления
-        item_index = pseudo_random(game_state.get('steps_taken', 0), len(inventory))
+        item_index = draw(game_state, 0, len(inventory))
         lost_item = inventory.pop(item_index)
-        print(f"Вы потеряли предмет: {lost_item}")
+        emit(game_state, 'item_lost', lost_item)
     else:
         # Игрок получает урон
-        damage_chance = pseudo_random(game_state.get('steps_taken', 0), 10)
+        damage_chance = draw(game_state, 0, 10)
         if damage_chance < 3:
-            print("Ловушка нанесла смертельный урон! Игра окончена.")
-            game_state['game_over'] = True
+            game_state.game_over = True
+            emit(game_state, 'game_over', 'trap')
         else:
-            print("Вам удалось увернуться от ловушки!")
+            emit(game_state, 'trap_dodged')
 
 
 def random_event(game_state):
@@ -49,42 +48,41 @@ def random_event(game_state):
     Создает случайные события во время перемещения игрока
     """
     # Проверяем, произойдет ли событие (вероятность 1/10)
-    event_chance = pseudo_random(game_state.get('steps_taken', 0), 10)
+    event_chance = draw(game_state, 0, 10)
     if event_chance != 0:
         return
     
     # Выбираем тип события
-    event_type = pseudo_random(game_state.get('steps_taken', 0) + 1, 3)
+    event_type = draw(game_state, 1, 3)
     
     match event_type:
         case 0:  # Находка
-            print("Вы нашли на полу блестящую монетку!")
-            current_room = game_state['current_room']
-            room_data = ROOMS.get(current_room, {})
-            if 'coin' not in room_data.get('items', []):
-                room_data.setdefault('items', []).append('coin')
+            current_room = game_state.current_room
+            emit(game_state, 'coin_found', current_room)
+            room_data = get_room(game_state, current_room)
+            if 'coin' not in room_data.get('items', ()):
+                add_room_item(game_state, current_room, 'coin')
         
         case 1:  # Испуг
-            print("Вы слышите странный шорох из темноты...")
-            inventory = game_state.get('player_inventory', [])
-            if 'sword' in inventory:
-                print("Вы достаете меч, и существо отступает!")
-            else:
-                print("Вам становится не по себе...")
+            emit(game_state, 'noise', 'sword' in game_state.player_inventory)
         
         case 2:  # Ловушка
-            current_room = game_state['current_room']
-            inventory = game_state.get('player_inventory', [])
+            current_room = game_state.current_room
+            inventory = game_state.player_inventory
             if current_room == 'trap_room' and 'torch' not in inventory:
-                print("Вы чувствуете опасность...")
+                emit(game_state, 'danger', current_room)
                 trigger_trap(game_state)
 
 
-def show_help():
+# Текст справки: список команд не меняется, собирается один раз
+HELP_TEXT = '\n'.join(
+    ["\nДоступные команды:"]
+    + [f"  {cmd:<16} - {description}" for cmd, description in COMMANDS_HELP.items()])
+
+
+def show_help(game_state=None):
     """Отображение справки по командам с красивым форматированием"""
-    print("\nДоступные команды:")
-    for cmd, description in COMMANDS_HELP.items():
-        print(f"  {cmd:<16} - {description}")
+    emit(game_state, 'text', 'help', HELP_TEXT)
 
 
 def parse_command(user_input):
@@ -100,195 +98,254 @@ def parse_command(user_input):
 
 
 def is_valid_command(command):
-    """Проверка валидности команды"""
-    for cmd_type, cmd_list in COMMANDS.items():
-        if command in cmd_list:
-            return True
-    return False
+    """Проверка валидности команды (точный синоним)"""
+    return command in ALIAS_INDEX
 
 
 def get_command_type(command):
-    """Определение типа команды"""
-    for cmd_type, cmd_list in COMMANDS.items():
-        if command in cmd_list:
-            return cmd_type
-    return None
+    """Определение типа команды по синониму или сокращению"""
+    return resolve_command(command)
 
 
 def is_valid_direction(direction):
     """Проверка валидности направления"""
-    valid_directions = ['north', 'south', 'east', 'west']
-    return direction in valid_directions
+    return direction in DIRECTIONS
 
 
 
-def display_welcome():
+def display_welcome(game_state=None):
     """Отображение приветственного сообщения"""
-    print("=" * 50)
-    print(MESSAGES['welcome'])
-    print("=" * 50)
+    say(game_state, "=" * 50)
+    say(game_state, MESSAGES['welcome'])
+    say(game_state, "=" * 50)
 
 
-def format_room_description(description):
+def format_room_description(description, game_state=None):
     """Форматирование описания комнаты"""
-    print("\n" + "=" * 50)
-    print(description)
-    print("=" * 50)
+    say(game_state, "\n" + "=" * 50)
+    say(game_state, description)
+    say(game_state, "=" * 50)
 
 
 def clear_screen():
     """Очистка экрана (кроссплатформенная)"""
-    import os
     os.system('cls' if os.name == 'nt' else 'clear')
 
 
-def show_map(player):
-    """Показать карту с посещенными комнатами"""
-    from .constants import ROOMS
+def show_map(game_state):
+    """Показать карту с посещенными комнатами и путями до них"""
+    current_room = game_state.current_room
     
-    print("\n--- КАРТА ЛАБИРИНТА ---")
-    for room_name in player.visited_rooms:
-        room_data = ROOMS.get(room_name, {})
+    # Расстояния от текущей комнаты до посещенных - одним обходом, который
+    # заканчивается на самой дальней из них
+    routes = get_route_index(get_world(game_state)).table_from(
+        current_room, held_keys(game_state), game_state.visited_rooms)
+    
+    lines = ["\n--- КАРТА ЛАБИРИНТА ---"]
+    for room_name in game_state.visited_rooms:
+        room_data = get_room(game_state, room_name)
         exits = room_data.get('exits', {})
         
-        marker = "★" if room_name == player.current_room else "○"
-        print(f"{marker} {room_name}: {', '.join(exits.keys())}")
-    print("★ - ваше текущее положение")
+        marker = "★" if room_name == current_room else "○"
+        line = f"{marker} {room_name}: {', '.join(exits.keys())}"
+        if room_name != current_room:
+            step = routes.get(room_name)
+            if step:
+                line += f"  (шагов: {step[1]}, сначала {step[0]})"
+            else:
+                line += "  (пути нет)"
+        lines.append(line)
+    lines.append("★ - ваше текущее положение")
+    emit(game_state, 'text', 'map', '\n'.join(lines))
 
 
 def describe_current_room(game_state):
     """
     Описывает текущую комнату игрока
     """
-    from .constants import ROOMS
-    
-    current_room_name = game_state['current_room']
-    room_data = ROOMS.get(current_room_name, {})
-    
-    # Вывод названия комнаты в верхнем регистре
-    print(f"\n== {current_room_name.upper()} ==")
-    
-    # Вывод описания комнаты
-    description = room_data.get('description', 'Неизвестная комната.')
-    print(description)
+    room_name = game_state.current_room
+    if game_state.events is None:
+        # Горячий путь: событие никто не собирает, поэтому его поля не
+        # собираются, а текст (как у события room) берется из кэша описаний
+        say(game_state, room_text(game_state, room_name), end='')
+        return
+    room_data = get_room(game_state, room_name)
+    puzzle = (bool(room_data.get('puzzle'))
+              and not room_data.get('puzzle_solved', False))
+    emit(game_state, 'room', room_name,
+         room_data.get('description', 'Неизвестная комната.'),
+         tuple(room_data.get('items', ())),
+         tuple(room_data.get('exits', {})), puzzle)
+
+
+def ask(game_state, prompt):
+    """
+    Задает игроку вопрос: следующая строка ввода станет ответом на него
     
-    # Вывод списка предметов
-    items = room_data.get('items', [])
-    if items:
-        print("\nЗаметные предметы:", ", ".join(items))
+    Args:
+        prompt (str): Ключ вопроса из PROMPTS
+    """
+    game_state.pending_prompt = prompt
+
+
+def get_prompt(game_state):
+    """Приглашение к вводу: вопрос, ожидающий ответа, или ввод команды"""
+    return PROMPTS[game_state.pending_prompt or 'command']
+
+
+def show_prompt(game_state):
+    """Выводит приглашение к вводу (событие prompt)"""
+    emit(game_state, 'prompt', game_state.pending_prompt or 'command')
+
+
+def answer_prompt(game_state, answer):
+    """
+    Передает строку ввода обработчику заданного ранее вопроса
+    """
+    prompt = game_state.pending_prompt
+    game_state.pending_prompt = None
     
-    # Вывод доступных выходов
-    exits = room_data.get('exits', {})
-    if exits:
-        print("\nВыходы:", ", ".join(exits.keys()))
+    match prompt:
+        case 'puzzle':
+            return check_puzzle_answer(game_state, answer)
+        case 'treasure_choice':
+            return answer_treasure_choice(game_state, answer)
+        case 'treasure_code':
+            return check_treasure_code(game_state, answer)
+    return False
+
+
+def open_treasure(game_state):
+    """Открывает сундук и завершает игру победой"""
+    # Удаляем сундук из комнаты
+    remove_room_item(game_state, game_state.current_room, 'treasure_chest')
     
-    # Сообщение о наличии загадки
-    puzzle = room_data.get('puzzle')
-    if puzzle and not room_data.get('puzzle_solved', False):
-        print("\nКажется, здесь есть загадка (используйте команду solve).")
+    # Объявляем победу
+    emit(game_state, 'treasure_opened')
+    game_state.game_over = True
+    emit(game_state, 'game_over', 'won')
 
 
 def attempt_open_treasure(game_state):
     """
     Пытается открыть сундук с сокровищами
     """
-    current_room = game_state['current_room']
-    room_data = ROOMS.get(current_room, {})
-    inventory = game_state.get('player_inventory', [])
+    current_room = game_state.current_room
+    room_data = get_room(game_state, current_room)
+    inventory = game_state.player_inventory
     
     # Проверяем, находимся ли мы в комнате с сокровищами
-    if 'treasure_chest' not in room_data.get('items', []):
-        print("Здесь нет сундука с сокровищами.")
+    if 'treasure_chest' not in room_data.get('items', ()):
+        emit(game_state, 'no_chest', current_room)
         return False
     
     # Проверка наличия ключа
     if 'treasure_key' in inventory:
-        print("Вы применяете ключ, и замок щёлкает. Сундук открыт!")
-        
-        # Удаляем сундук из комнаты
-        room_data['items'].remove('treasure_chest')
-        
-        # Объявляем победу
-        print("В сундуке сокровище! Вы победили!")
-        game_state['game_over'] = True
+        emit(game_state, 'chest_unlocked', 'treasure_key')
+        open_treasure(game_state)
         return True
     
     # Если ключа нет, предлагаем ввести код
-    print("Сундук заперт. У вас нет ключа.")
-    choice = input("Ввести код? (да/нет): ").strip().lower()
-    
-    if choice == 'да':
-        # Получаем код от пользователя
-        user_code = input("Введите код: ").strip()
-        
-        # Проверяем код (используем загадку из комнаты как код)
-        puzzle = room_data.get('puzzle')
-        if puzzle and user_code == puzzle[1]:  # puzzle[1] - правильный ответ
-            print("Код верный! Сундук открыт!")
-            
-            # Удаляем сундук из комнаты
-            room_data['items'].remove('treasure_chest')
-            
-            # Объявляем победу
-            print("В сундуке сокровище! Вы победили!")
-            game_state['game_over'] = True
-            return True
-        else:
-            print("Неверный код. Сундук остается запертым.")
-            return False
-    else:
-        print("Вы отступаете от сундука.")
+    emit(game_state, 'chest_locked')
+    ask(game_state, 'treasure_choice')
+    return False
+
+
+def answer_treasure_choice(game_state, choice):
+    """
+    Обрабатывает ответ на вопрос "Ввести код?"
+    """
+    if choice.strip().lower() == 'да':
+        # Получаем код от пользователя следующей строкой
+        ask(game_state, 'treasure_code')
         return False
+    
+    emit(game_state, 'chest_left')
+    return False
+
+
+def check_treasure_code(game_state, user_code):
+    """
+    Проверяет код от сундука
+    """
+    room_data = get_room(game_state, game_state.current_room)
+    
+    # Проверяем код (используем загадку из комнаты как код). Код сверяется
+    # без опечаток, но "десять" и " 10 " засчитываются как 10
+    puzzle = room_data.get('puzzle')
+    if puzzle and check_answer(user_code, (puzzle[1],), fuzzy=False):
+        count_event(game_state, 'treasure_code', 'correct')
+        emit(game_state, 'code_accepted')
+        open_treasure(game_state)
+        return True
+    
+    count_event(game_state, 'treasure_code', 'wrong')
+    emit(game_state, 'code_rejected')
+    return False
 
 
 def solve_puzzle(game_state):
     """
     Решает загадку в текущей комнате с улучшенной логикой
+    
+    Ответ игрока придет следующей строкой ввода (см. check_puzzle_answer).
     """
-    current_room = game_state['current_room']
-    room_data = ROOMS.get(current_room, {})
+    current_room = game_state.current_room
+    room_data = get_room(game_state, current_room)
     puzzle = room_data.get('puzzle')
     
     # Проверяем, есть ли загадка в комнате
     if not puzzle:
-        print("Загадок здесь нет.")
+        emit(game_state, 'no_puzzle', current_room)
         return False
     
     # Проверяем, не решена ли уже загадка
     if room_data.get('puzzle_solved', False):
-        print("Вы уже решили загадку в этой комнате.")
+        emit(game_state, 'puzzle_already_solved', current_room)
         return True
     
-    # Выводим вопрос загадки
-    question, correct_answer = puzzle
-    print(f"Загадка: {question}")
-    
-    # Получаем ответ от пользователя
-    user_answer = input("Ваш ответ: ").strip().lower()
+    # Выводим вопрос загадки и ждем ответа
+    question, _ = puzzle
+    emit(game_state, 'puzzle_asked', current_room, question)
+    ask(game_state, 'puzzle')
+    return False
+
+
+def check_puzzle_answer(game_state, user_answer):
+    """
+    Проверяет ответ на загадку текущей комнаты
+    """
+    current_room = game_state.current_room
+    room_data = get_room(game_state, current_room)
+    _, correct_answer = room_data['puzzle']
     
-    # Проверяем альтернативные варианты ответов
-    correct_answers = [correct_answer.lower()]
-    if current_room in PUZZLES and len(PUZZLES[current_room]) > 1:
-        correct_answers.extend(PUZZLES[current_room][1:])
+    # Проверяем альтернативные варианты ответов: в мирах из файла они
+    # хранятся в самой комнате, PUZZLES относится только к встроенному миру
+    alternatives = room_data.get('answers')
+    if alternatives is None and not game_state.world_path:
+        alternatives = PUZZLES.get(current_room)
+    alternatives = alternatives or ()
+    correct_answers = (correct_answer,) + tuple(alternatives[1:])
     
-    # Сравниваем ответ с правильным
-    if user_answer in correct_answers:
-        print("Правильно! Загадка решена!")
+    # Сравниваем ответ с правильным: без учета регистра, знаков препинания
+    # и формы записи чисел, с допуском на опечатку в длинных словах
+    if check_answer(user_answer, correct_answers):
+        count_event(game_state, 'puzzle', 'correct')
+        emit(game_state, 'puzzle_solved', current_room)
         
         # Помечаем загадку как решенную
-        room_data['puzzle_solved'] = True
+        mark_puzzle_solved(game_state, current_room)
         
         # Добавляем награду игроку
         reward = room_data.get('reward')
         if reward:
-            if 'player_inventory' not in game_state:
-                game_state['player_inventory'] = []
-            game_state['player_inventory'].append(reward)
-            print(f"Вы получили награду: {reward}")
+            game_state.player_inventory.append(reward)
+            emit(game_state, 'item_gained', reward, 'reward', None)
         
         return True
     else:
-        print("Неверно. Попробуйте снова.")
+        count_event(game_state, 'puzzle', 'wrong')
+        emit(game_state, 'puzzle_failed', current_room)
         # В trap_room неверный ответ активирует ловушку
         if current_room == 'trap_room':
             trigger_trap(game_state)
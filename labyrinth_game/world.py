@@ -0,0 +1,168 @@
+# Мир игры: неизменяемая базовая карта и изменения отдельной сессии
+from .constants import ROOMS
+
+# Встроенный мир, если сессия не загружала мир из файла
+DEFAULT_WORLD = ROOMS
+
+# worldfile.open_world, когда модуль уже импортирован (см. load_world)
+_open_world = None
+
+
+def load_world(path):
+    """
+    Открывает файл мира (один раз на процесс)
+
+    Модуль worldfile (json, hashlib, mmap) импортируется при первом
+    файле мира: игре на встроенной карте он не нужен, а его импорт
+    заметно удлиняет запуск. Открытые миры кэширует сам worldfile.
+    """
+    global _open_world
+    if _open_world is None:
+        from .worldfile import open_world
+        _open_world = open_world
+    return _open_world(path)
+
+
+def get_world(game_state):
+    """
+    Базовая карта, на которой играет сессия
+
+    В состоянии хранится только путь к файлу мира (game_state.world_path),
+    сам файл открывается один раз на процесс и читается лениво.
+    """
+    path = game_state.world_path
+    if not path:
+        return DEFAULT_WORLD
+    return load_world(path)
+
+
+def start_room(world):
+    """Стартовая комната мира"""
+    return getattr(world, 'start_room', 'entrance')
+
+
+def get_room(game_state, room_name):
+    """
+    Возвращает данные комнаты с учетом изменений, сделанных в сессии
+
+    Базовая карта не изменяется: все изменения сессии хранятся
+    в game_state.world_overlay в виде {комната: {поле: значение}}.
+    """
+    room_data = get_world(game_state).get(room_name, {})
+    delta = game_state.world_overlay.get(room_name)
+    if delta:
+        return {**room_data, **delta}
+    return room_data
+
+
+def room_version(game_state, room_name):
+    """
+    Версия комнаты в сессии: растет при каждом ее изменении
+
+    По версии кэши (например, описание комнаты) понимают, что комната
+    изменилась. Версии живут только в памяти процесса: у восстановленной
+    сессии они начинаются заново вместе с кэшами.
+    """
+    versions = game_state.room_versions
+    return versions.get(room_name, 0) if versions else 0
+
+
+def _room_delta(game_state, room_name):
+    """
+    Изменения комнаты в сессии (создаются при первой записи)
+
+    Через эту функцию проходит любое изменение комнаты, поэтому здесь же
+    растет ее версия.
+    """
+    versions = game_state.room_versions
+    if versions is None:
+        versions = game_state.room_versions = {}
+    versions[room_name] = versions.get(room_name, 0) + 1
+    overlay = game_state.world_overlay
+    return overlay.setdefault(room_name, {})
+
+
+def _own_items(game_state, room_name):
+    """
+    Список предметов комнаты, принадлежащий сессии (копия при записи)
+    """
+    delta = _room_delta(game_state, room_name)
+    if 'items' not in delta:
+        base = get_world(game_state).get(room_name, {})
+        delta['items'] = list(base.get('items', ()))
+    return delta['items']
+
+
+def add_room_item(game_state, room_name, item_name):
+    """Кладет предмет в комнату"""
+    _own_items(game_state, room_name).append(item_name)
+
+
+def remove_room_item(game_state, room_name, item_name):
+    """Убирает предмет из комнаты"""
+    _own_items(game_state, room_name).remove(item_name)
+
+
+def mark_puzzle_solved(game_state, room_name):
+    """Помечает загадку комнаты решенной"""
+    _room_delta(game_state, room_name)['puzzle_solved'] = True
+
+
+def render_room(room_name, room_data):
+    """
+    Текст описания комнаты: название, описание, предметы, выходы
+    и подсказка о загадке
+    """
+    # Название комнаты в верхнем регистре и описание
+    description = room_data.get('description', 'Неизвестная комната.')
+    lines = [f"\n== {room_name.upper()} ==", description]
+    
+    # Список предметов
+    items = room_data.get('items', ())
+    if items:
+        lines.append("\nЗаметные предметы: " + ", ".join(items))
+    
+    # Доступные выходы
+    exits = room_data.get('exits', {})
+    if exits:
+        lines.append("\nВыходы: " + ", ".join(exits.keys()))
+    
+    # Сообщение о наличии загадки
+    puzzle = room_data.get('puzzle')
+    if puzzle and not room_data.get('puzzle_solved', False):
+        lines.append("\nКажется, здесь есть загадка (используйте команду solve).")
+    return '\n'.join(lines) + '\n'
+
+
+# Описания комнат, которые сессии не меняли: {путь к миру: {комната: текст}}.
+# Общие для всех сессий процесса, как и прочитанные комнаты мира.
+_ROOM_TEXTS = {}
+
+
+def room_text(game_state, room_name):
+    """
+    Описание комнаты из кэша
+
+    Комната без изменений в сессии берется из общего кэша мира, измененная -
+    из кэша сессии, пока не изменилась ее версия (см. room_version).
+    """
+    if room_name not in game_state.world_overlay:
+        texts = _ROOM_TEXTS.get(game_state.world_path)
+        if texts is None:
+            texts = _ROOM_TEXTS[game_state.world_path] = {}
+        text = texts.get(room_name)
+        if text is None:
+            text = texts[room_name] = render_room(
+                room_name, get_room(game_state, room_name))
+        return text
+
+    version = room_version(game_state, room_name)
+    texts = game_state.room_texts
+    if texts is None:
+        texts = game_state.room_texts = {}
+    cached = texts.get(room_name)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    text = render_room(room_name, get_room(game_state, room_name))
+    texts[room_name] = (version, text)
+    return text
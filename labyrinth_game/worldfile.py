@@ -0,0 +1,256 @@
+# Файл мира: компактный формат с индексом и ленивой загрузкой комнат через mmap
+#
+# Устройство файла:
+#   заголовок   HEADER (магия, версия, число комнат, смещения индекса и meta)
+#   записи      комнаты в JSON (UTF-8), одна за другой, в порядке записи
+#   meta        JSON с параметрами мира (стартовая комната и т.п.)
+#   индекс      записи INDEX_ENTRY (хэш имени, смещение, длина),
+#               отсортированные по хэшу для двоичного поиска
+import argparse
+import hashlib
+import json
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+from collections.abc import ItemsView, Mapping
+
+from .constants import PUZZLES, ROOMS
+
+MAGIC = b'LABWRLD1'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQQQQ')
+INDEX_ENTRY = struct.Struct('<QQI')
+
+
+def name_hash(room_name):
+    """64-битный хэш имени комнаты для индекса"""
+    digest = hashlib.blake2b(room_name.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def decode_room(data):
+    """
+    Восстанавливает комнату из записи в той же схеме, что и ROOMS
+    (предметы и загадка - кортежи)
+    """
+    room = json.loads(data)
+    name = room.pop('name')
+    room['items'] = tuple(room.get('items', ()))
+    if room.get('puzzle'):
+        room['puzzle'] = tuple(room['puzzle'])
+    if room.get('answers'):
+        room['answers'] = tuple(room['answers'])
+    return name, room
+
+
+class WorldWriter:
+    """
+    Потоковая запись мира: комнаты пишутся по одной, в памяти остается
+    только индекс (20 байт на комнату)
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(b'\0' * HEADER.size)
+        self.hashes = array('Q')
+        self.offsets = array('Q')
+        self.lengths = array('I')
+
+    def add_room(self, room_name, room_data):
+        """Дописывает комнату в файл"""
+        record = {'name': room_name, **room_data}
+        data = json.dumps(record, ensure_ascii=False,
+                          separators=(',', ':')).encode()
+        self.hashes.append(name_hash(room_name))
+        self.offsets.append(self.file.tell())
+        self.lengths.append(len(data))
+        self.file.write(data)
+
+    def close(self, meta=None):
+        """Дописывает meta и индекс, заполняет заголовок и закрывает файл"""
+        meta_data = json.dumps(meta or {}, ensure_ascii=False).encode()
+        meta_offset = self.file.tell()
+        self.file.write(meta_data)
+
+        index_offset = self.file.tell()
+        order = sorted(range(len(self.hashes)), key=self.hashes.__getitem__)
+        buffer = bytearray(INDEX_ENTRY.size * len(order))
+        for position, i in enumerate(order):
+            INDEX_ENTRY.pack_into(buffer, position * INDEX_ENTRY.size,
+                                  self.hashes[i], self.offsets[i],
+                                  self.lengths[i])
+        self.file.write(buffer)
+
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, len(order),
+                                    index_offset, meta_offset, len(meta_data)))
+        self.file.close()
+
+
+def write_world(path, rooms, meta=None):
+    """Записывает мир из пар (имя, комната) или словаря комнат"""
+    items = rooms.items() if isinstance(rooms, Mapping) else rooms
+    writer = WorldWriter(path)
+    for room_name, room_data in items:
+        writer.add_room(room_name, room_data)
+    writer.close(meta)
+
+
+class _MappedItems(ItemsView):
+    """Пары (имя, комната) подряд по файлу, без заполнения кэша комнат"""
+
+    def __iter__(self):
+        world = self._mapping
+        for name, room in world._records():
+            yield name, world.rooms.get(name, room)
+
+
+class MappedWorld(Mapping):
+    """
+    Мир из файла: словарь комнат, который читает записи из mmap
+    при первом обращении и держит в памяти только прочитанные комнаты
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self.count, self.index_offset,
+         meta_offset, meta_length) = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: это не файл мира Лабиринта")
+        self.meta = json.loads(self.map[meta_offset:meta_offset + meta_length])
+        self.rooms = {}
+        # Хэши индекса подряд (8 байт на комнату): читаются при первом
+        # обходе карты (peek), чтобы искать записи bisect, а не по одной
+        self.hashes = None
+
+    def _entry(self, position):
+        return INDEX_ENTRY.unpack_from(
+            self.map, self.index_offset + position * INDEX_ENTRY.size)
+
+    def _read(self, offset, length):
+        return decode_room(self.map[offset:offset + length])
+
+    def _find(self, room_name):
+        """Двоичный поиск комнаты в индексе; возвращает данные или None"""
+        target = name_hash(room_name)
+        if self.hashes is not None:
+            low = bisect_left(self.hashes, target)
+        else:
+            low, high = 0, self.count
+            while low < high:
+                middle = (low + high) // 2
+                if self._entry(middle)[0] < target:
+                    low = middle + 1
+                else:
+                    high = middle
+        # Несколько имен с одинаковым хэшем идут подряд
+        while low < self.count:
+            hash_value, offset, length = self._entry(low)
+            if hash_value != target:
+                break
+            name, room = self._read(offset, length)
+            if name == room_name:
+                return room
+            low += 1
+        return None
+
+    def __getitem__(self, room_name):
+        room = self.rooms.get(room_name)
+        if room is None:
+            room = self._find(room_name)
+            if room is None:
+                raise KeyError(room_name)
+            self.rooms[room_name] = room
+        return room
+
+    def peek(self, room_name, default=None):
+        """
+        Комната без записи в кэш: для обходов карты (маршруты, карта),
+        которые читают много комнат по одному разу
+        """
+        room = self.rooms.get(room_name)
+        if room is None:
+            if self.hashes is None:
+                index = self.map[self.index_offset:
+                                 self.index_offset + self.count * INDEX_ENTRY.size]
+                self.hashes = array('Q', (entry[0] for entry
+                                          in INDEX_ENTRY.iter_unpack(index)))
+            room = self._find(room_name)
+        return default if room is None else room
+
+    def __contains__(self, room_name):
+        try:
+            self[room_name]
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def _records(self):
+        """Все записи файла по порядку индекса; в кэш комнат не попадают"""
+        for position in range(self.count):
+            _, offset, length = self._entry(position)
+            yield self._read(offset, length)
+
+    def __iter__(self):
+        # Обход имен читает все записи файла, но держит в памяти только
+        # комнаты, к которым уже обращались по имени
+        for name, _ in self._records():
+            yield name
+
+    def items(self):
+        return _MappedItems(self)
+
+    @property
+    def start_room(self):
+        return self.meta.get('start', 'entrance')
+
+
+# Открытые миры: {путь: MappedWorld}
+_OPEN_WORLDS = {}
+
+
+def open_world(path):
+    """Открывает файл мира (один раз на процесс)"""
+    world = _OPEN_WORLDS.get(path)
+    if world is None:
+        world = _OPEN_WORLDS[path] = MappedWorld(path)
+    return world
+
+
+def build_default_world(path):
+    """Записывает встроенный мир ROOMS в файл"""
+    def rooms():
+        for room_name, room_data in ROOMS.items():
+            room = dict(room_data)
+            # Альтернативные ответы хранятся прямо в записи комнаты
+            if room_name in PUZZLES:
+                room['answers'] = PUZZLES[room_name]
+            yield room_name, room
+
+    write_world(path, rooms(), {'start': 'entrance', 'name': 'builtin'})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Файлы миров Лабиринта")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="записать встроенный мир")
+    build.add_argument('path')
+    info = commands.add_parser('info', help="сведения о файле мира")
+    info.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        build_default_world(args.path)
+    else:
+        world = MappedWorld(args.path)
+        print(f"Комнат: {len(world)}, meta: {world.meta}")
+
+
+if __name__ == "__main__":
+    main()